@@ -1,10 +1,29 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import avro.schema
-import avro.io
-import io
 import os
+import uuid
+import queue
+import threading
+import zipfile
+import weakref
 import datetime
+from plotting import ChartWindow
+from comparison import ComparisonEngine
+from quality import QualityScanner
+from parallel_stats import describe
+from export import export_entries, import_into
+from history import History
+from research_entry import ResearchEntry
+from storage import FileLock, ChangeLog, ConflictError, DuplicateEntryError, LOG_ROTATE_RECORDS, DEFAULT_ENCODING, check_encoding, quantize_points, content_hash, points_hash, entry_delta, replay_entry, read_settings, read_entries, write_entries
+
+# Milliseconds between checks for changes made by other users
+REFRESH_INTERVAL_MS = 2000
+# Milliseconds between checks for a finished analysis
+ANALYSIS_POLL_MS = 50
+
+# Analyses run on worker threads; the quality scanner's cache is shared between them
+quality_lock = threading.Lock()
 
 # Class to manage research data entries
 class ResearchDataManager:
@@ -12,57 +31,415 @@ class ResearchDataManager:
         self.entries = []
         self.filename = "research_data.avro"
         self.schema = avro.schema.Parse(open("research_data_schema.avsc", "r").read())
+        self.change_log = ChangeLog(self.filename)
+        # Saved versions of every entry, see get_entries_as_of
+        self.history = History(self.filename)
+        # Numeric encoding of the data points of this dataset, see set_encoding
+        self.encoding = DEFAULT_ENCODING
+        # Whether identical point arrays are stored once in the snapshot, see set_deduplicate
+        self.deduplicate = False
+        # Content hash -> entry id (a tuple of ids while several entries share it, as
+        # when another user saved an identical entry), rebuilt from the stored hashes when None
+        self.hash_index = None
+        # Entry id -> position in entries; appends keep it up to date, removals
+        # (which shift later entries anyway) drop it to be rebuilt when needed
+        self.positions = None
+        # Points hash -> point array of some entry, so identical arrays are kept once.
+        # Arrays read from the file are only hashed once an array of the same length
+        # is shared: length -> weak references to the arrays not hashed yet.
+        self.points_index = weakref.WeakValueDictionary()
+        self.unhashed_points = {}
+        # Bumped whenever the entries change, so caches built on them know when to prune
+        self.revision = 0
+        self.log_generation = None
+        self.log_offset = 0
+        self.log_records = 0
+        # Local edits not saved yet: entry id -> version the edit is based on (None for new entries)
+        self.pending = {}
+        # Entries as they were before their unsaved local edits: entry id -> entry
+        self.originals = {}
+        # Local edits clashing with another user's change: entry id -> their entry (None if deleted)
+        self.conflicts = {}
         self.load_entries_from_file()
 
     # Function to add a research data entry
+    # Raises DuplicateEntryError if an identical entry exists.
     def add_entry(self, experiment_name, date, researcher, data_points):
-        self.entries.append({
-            'experiment_name': experiment_name,
-            'date': date,
-            'researcher': researcher,
-            'data_points': data_points
-        })
+        data_points = quantize_points(data_points, self.encoding)
+        entry_id = uuid.uuid4().hex
+        entry = ResearchEntry(experiment_name, date, researcher, data_points, entry_id)
+        entry.content_hash = content_hash(entry)
+        duplicate_id = self.find_duplicate(entry.content_hash)
+        if duplicate_id is not None:
+            raise DuplicateEntryError(duplicate_id)
+        self.share_points(entry)
+        if self.positions is not None:
+            self.positions[entry_id] = len(self.entries)
+        self.entries.append(entry)
+        self.index_hash(entry)
+        self.pending[entry_id] = None
+        self.revision += 1
 
     # Function to update a research data entry
+    # Raises DuplicateEntryError if the update would make it identical to another entry.
     def update_entry(self, index, experiment_name, date, researcher, data_points):
         if 0 <= index < len(self.entries):
-            self.entries[index] = {
-                'experiment_name': experiment_name,
-                'date': date,
-                'researcher': researcher,
-                'data_points': data_points
-            }
+            data_points = quantize_points(data_points, self.encoding)
+            current = self.entries[index]
+            entry = ResearchEntry(experiment_name, date, researcher, data_points, current.entry_id, current.version)
+            entry.content_hash = content_hash(entry)
+            duplicate_id = self.find_duplicate(entry.content_hash, current.entry_id)
+            if duplicate_id is not None:
+                raise DuplicateEntryError(duplicate_id)
+            if current.entry_id not in self.pending:
+                self.originals[current.entry_id] = current
+            self.pending.setdefault(current.entry_id, current.version)
+            self.unindex_hash(current)
+            self.index_hash(entry)
+            self.share_points(entry)
+            self.entries[index] = entry
+            self.revision += 1
 
     # Function to delete a research data entry
     def delete_entry(self, index):
         if 0 <= index < len(self.entries):
+            entry_id = self.entries[index].entry_id
+            if entry_id in self.pending and self.pending[entry_id] is None:
+                del self.pending[entry_id]
+            else:
+                if entry_id not in self.pending:
+                    self.originals[entry_id] = self.entries[index]
+                self.pending.setdefault(entry_id, self.entries[index].version)
+            self.unindex_hash(self.entries[index])
             del self.entries[index]
+            self.positions = None
+            self.revision += 1
+
+    # Function to take back new entries that were added but not saved yet, such as
+    # the part of a bulk add that failed. Saved entries among entry_ids are left alone.
+    def discard_new_entries(self, entry_ids):
+        entry_ids = {entry_id for entry_id in entry_ids if entry_id in self.pending and self.pending[entry_id] is None}
+        if not entry_ids:
+            return
+        for entry_id in entry_ids:
+            del self.pending[entry_id]
+            self.unindex_hash(self.entries[self.index_of(entry_id)])
+        self.entries = [entry for entry in self.entries if entry.entry_id not in entry_ids]
+        self.positions = None
+        self.revision += 1
 
     def get_entries(self):
         return self.entries
 
-    # Function to save entries to a file
-    def save_entries_to_file(self):
-        with open(self.filename, 'wb') as file:
-            writer = avro.io.DatumWriter(self.schema)
-            buffer = io.BytesIO()
-            encoder = avro.io.BinaryEncoder(buffer)
+    # Function to get the position of the entry with an id, or None if it no longer exists
+    def index_of(self, entry_id):
+        return self.position_index().get(entry_id)
+
+    # Function to get the entry id -> position map, building it if needed
+    def position_index(self):
+        if self.positions is None:
+            self.positions = {entry.entry_id: i for i, entry in enumerate(self.entries)}
+        return self.positions
+
+    # Function to get the entries as they were saved at a point in time (a datetime
+    # or a Unix timestamp). Entries not edited since history was kept are taken as they are now.
+    def get_entries_as_of(self, when):
+        self.history.refresh()
+        saved = [self.originals.get(entry.entry_id, entry) for entry in self.entries if self.pending.get(entry.entry_id, 0) is not None]
+        saved += [entry for entry_id, entry in self.originals.items() if entry_id not in {item.entry_id for item in self.entries}]
+        unchanged = [entry for entry in saved if entry.entry_id not in self.history.index]
+        return unchanged + self.history.entries_as_of(when)
+
+    # Function to get the id of an entry with a content hash other than exclude, or None
+    def find_duplicate(self, entry_hash, exclude=None):
+        owners = [entry_id for entry_id in self.hash_owners(entry_hash) if entry_id != exclude]
+        return owners[0] if owners else None
+
+    # Function to get the ids of the entries with a content hash
+    def hash_owners(self, entry_hash):
+        if self.hash_index is None:
+            self.hash_index = {}
             for entry in self.entries:
-                writer.write(entry, encoder)
-            file.write(buffer.getvalue())
+                self.index_hash(entry)
+        owners = self.hash_index.get(entry_hash, ())
+        return owners if isinstance(owners, tuple) else (owners,)
+
+    # Function to add an entry to the content hash index
+    def index_hash(self, entry):
+        if self.hash_index is None:
+            return
+        owners = self.hash_index.get(entry.content_hash)
+        if owners is None:
+            self.hash_index[entry.content_hash] = entry.entry_id
+        elif isinstance(owners, tuple):
+            self.hash_index[entry.content_hash] = owners + (entry.entry_id,)
+        elif owners != entry.entry_id:
+            self.hash_index[entry.content_hash] = (owners, entry.entry_id)
+
+    # Function to remove an entry from the content hash index
+    def unindex_hash(self, entry):
+        if self.hash_index is None:
+            return
+        owners = self.hash_index.get(entry.content_hash)
+        if owners == entry.entry_id:
+            del self.hash_index[entry.content_hash]
+        elif isinstance(owners, tuple):
+            rest = tuple(entry_id for entry_id in owners if entry_id != entry.entry_id)
+            self.hash_index[entry.content_hash] = rest[0] if len(rest) == 1 else rest
+
+    # Function to remember the point arrays of entries read from the file, to be hashed when needed
+    def add_unhashed_points(self, entries):
+        for entry in entries:
+            self.unhashed_points.setdefault(len(entry.data_points), []).append(weakref.ref(entry.data_points))
+
+    # Function to make an entry share the point array of another entry with identical points
+    def share_points(self, entry):
+        # Only arrays of the same length can be identical
+        for reference in self.unhashed_points.pop(len(entry.data_points), ()):
+            points = reference()
+            if points is not None:
+                self.points_index.setdefault(points_hash(points), points)
+        key = points_hash(entry.data_points)
+        shared = self.points_index.get(key)
+        if shared is not None and shared is not entry.data_points and shared == entry.data_points:
+            entry.data_points = shared
+        else:
+            self.points_index[key] = entry.data_points
+
+    # Function to save entries to a file.
+    # Raises ConflictError, without writing anything, if another user changed
+    # an entry that was edited here since it was last read, DuplicateEntryError if
+    # an edited entry is now identical to one another user saved, and ValueError
+    # if an edited entry does not fit an encoding another user switched to.
+    # Returns the ids of new entries that were dropped because another user had
+    # saved identical ones in the meantime.
+    def save_entries_to_file(self):
+        with FileLock(self.filename):
+            self.catch_up()
+            conflicting = [entry_id for entry_id in self.pending if entry_id in self.conflicts]
+            if conflicting:
+                raise ConflictError(conflicting)
+
+            # Other users may have saved entries identical to the local edits since they were checked
+            dropped = []
+            for entry_id, base_version in self.pending.items():
+                position = self.index_of(entry_id)
+                if position is None:
+                    continue
+                others = [owner for owner in self.hash_owners(self.entries[position].content_hash) if owner != entry_id and owner not in self.pending]
+                if not others:
+                    continue
+                if base_version is not None:
+                    raise DuplicateEntryError(others[0])
+                dropped.append(entry_id)
+            if dropped:
+                for entry_id in dropped:
+                    del self.pending[entry_id]
+                    self.unindex_hash(self.entries[self.index_of(entry_id)])
+                removed = set(dropped)
+                self.entries = [entry for entry in self.entries if entry.entry_id not in removed]
+                self.positions = None
+                self.revision += 1
+
+            positions = self.position_index()
+            # The encoding may have been changed by another user since the edits;
+            # every entry is checked against it before anything is changed
+            quantized = {
+                entry_id: quantize_points(self.entries[positions[entry_id]].data_points, self.encoding)
+                for entry_id in self.pending if entry_id in positions
+            }
+            records = []
+            for entry_id, base_version in self.pending.items():
+                version = (base_version or 0) + 1
+                entry = None
+                delta = None
+                if entry_id in positions:
+                    entry = self.entries[positions[entry_id]]
+                    data_points = quantized[entry_id]
+                    if data_points != entry.data_points:
+                        self.unindex_hash(entry)
+                        entry.data_points = data_points
+                        entry.content_hash = content_hash(entry)
+                        self.index_hash(entry)
+                        self.revision += 1
+                    entry.version = version
+                    # Edits of saved entries are logged as a delta against the version they are based on
+                    original = self.originals.get(entry_id)
+                    if original is not None and original.version == base_version:
+                        delta = entry_delta(original, entry)
+                records.append({'entry_id': entry_id, 'version': version, 'entry': entry, 'delta': delta})
+
+            # Once the records are synced to the change log the edit is durable;
+            # the snapshot is only rewritten when the log has grown long
+            if records:
+                self.log_offset = self.change_log.append(records)
+                self.log_generation = self.change_log.generation()
+                self.log_records += len(records)
+            originals, self.originals = self.originals, {}
+            self.pending = {}
+            # Each saved version is also kept in the history, as a delta of the previous one
+            if records:
+                self.history.record(records, originals)
+
+            if self.log_records > LOG_ROTATE_RECORDS or not os.path.exists(self.filename):
+                self.checkpoint()
+        return dropped
+
+    # Function to write all entries to a new snapshot, restart the change log and sync the history index
+    # (the caller holds the lock and has no unsaved edits). A crash between the two
+    # steps is harmless: replaying the old log onto the new snapshot changes nothing.
+    def checkpoint(self):
+        write_entries(self.filename, self.schema, self.entries, self.encoding, self.deduplicate)
+        self.change_log.rotate()
+        self.log_generation, _, self.log_offset = self.change_log.read()
+        self.log_records = 0
+        self.history.sync()
+
+    # Function to change how the data points of this dataset are stored:
+    # {'type': 'float64'} or 'float32', or 'int16'/'int32' with a 'scale' and 'offset'
+    # (value = stored integer * scale + offset) for integer-valued sensors.
+    # Entries whose points the encoding changes are saved as new versions.
+    # Raises ValueError, without changing anything, if some entry does not fit.
+    def set_encoding(self, encoding):
+        encoding = check_encoding(encoding)
+        with FileLock(self.filename):
+            self.catch_up()
+            if self.pending:
+                raise ValueError("Save or discard pending changes before changing the encoding.")
+            data_points = [quantize_points(entry.data_points, encoding) for entry in self.entries]
+            records = []
+            originals = {}
+            for i, (entry, points) in enumerate(zip(self.entries, data_points)):
+                if points == entry.data_points:
+                    continue
+                updated = ResearchEntry(entry.experiment_name, entry.date, entry.researcher, points, entry.entry_id, entry.version + 1)
+                updated.content_hash = content_hash(updated)
+                self.share_points(updated)
+                self.entries[i] = updated
+                originals[entry.entry_id] = entry
+                records.append({'entry_id': entry.entry_id, 'version': updated.version, 'entry': updated})
+            self.hash_index = None
+            self.revision += 1
+            self.encoding = encoding
+            self.checkpoint()
+            # The history keeps the points as they were before the encoding too
+            self.history.record(records, originals)
+
+    # Function to turn deduplicated storage of identical point arrays on or off
+    def set_deduplicate(self, enabled):
+        with FileLock(self.filename):
+            self.catch_up()
+            if self.pending:
+                raise ValueError("Save or discard pending changes before changing the storage.")
+            self.deduplicate = enabled
+            self.checkpoint()
 
     # Function to load entries from a file
     def load_entries_from_file(self):
-        if os.path.exists(self.filename):
-            with open(self.filename, 'rb') as file:
-                buffer = io.BytesIO(file.read())
-                decoder = avro.io.BinaryDecoder(buffer)
-                reader = avro.io.DatumReader(self.schema)
-                
-                self.entries = []
-                while buffer.tell() < len(buffer.getvalue()):
-                    entry = reader.read(decoder)
-                    self.entries.append(entry)
+        with FileLock(self.filename, exclusive=False):
+            generation, records, offset = self.change_log.read()
+            self.reload(records)
+            self.log_generation, self.log_offset = generation, offset
+
+    # Function to pick up changes saved by other users since the last read.
+    # Returns True if any entry changed.
+    def refresh(self):
+        with FileLock(self.filename, exclusive=False):
+            return self.catch_up()
+
+    # Function to apply the change log since the last read (the caller holds the lock)
+    def catch_up(self):
+        generation, records, offset = self.change_log.read(self.log_generation, self.log_offset)
+        if generation != self.log_generation:
+            # The log was restarted: start over from the snapshot
+            self.reload(records)
+            changed = True
+        else:
+            changed = self.apply_records(records)
+            self.log_records += len(records)
+        self.log_generation, self.log_offset = generation, offset
+        return changed
+
+    # Function to rebuild the entries from the snapshot plus change records,
+    # keeping local edits that have not been saved yet
+    def reload(self, records):
+        local = {entry.entry_id: entry for entry in self.entries if entry.entry_id in self.pending}
+        # Entries that did not change are kept as they are, with their shared point arrays
+        current = {entry.entry_id: entry for entry in self.entries if entry.entry_id not in self.pending}
+        self.encoding, self.deduplicate = read_settings(self.filename)
+        self.hash_index = None
+        self.positions = None
+        self.revision += 1
+        self.entries = []
+        loaded = []
+        for entry in (read_entries(self.filename) if os.path.exists(self.filename) else ()):
+            kept = current.get(entry.entry_id)
+            if kept is not None and kept.version == entry.version and kept.content_hash == entry.content_hash:
+                entry = kept
+            else:
+                loaded.append(entry)
+            self.entries.append(entry)
+        self.add_unhashed_points(loaded)
+        pending, self.pending = self.pending, {}
+        self.apply_records(records)
+        self.log_records = len(records)
+        self.pending = pending
+
+        for entry_id, base_version in pending.items():
+            position = self.index_of(entry_id)
+            remote = self.entries[position] if position is not None else None
+            if (remote.version if remote else None) != base_version:
+                self.conflicts[entry_id] = remote
+            self.put_entry(entry_id, local.get(entry_id))
+
+    # Function to apply change records of other users
+    def apply_records(self, records):
+        if not records:
+            return False
+        changed = False
+        for record in records:
+            entry_id = record['entry_id']
+            if entry_id in self.pending:
+                if record['version'] > (self.pending[entry_id] or 0):
+                    # Their version builds on the entry as it was before the local edit
+                    theirs = self.conflicts[entry_id] if entry_id in self.conflicts else self.originals.get(entry_id)
+                    self.conflicts[entry_id] = replay_entry(theirs, [record])
+                continue
+            position = self.index_of(entry_id)
+            current = self.entries[position] if position is not None else None
+            entry = replay_entry(current, [record])
+            if entry is current:
+                continue
+            self.put_entry(entry_id, entry)
+            changed = True
+        return changed
+
+    # Function to replace, add or (with None) remove the entry with an id
+    def put_entry(self, entry_id, entry):
+        self.revision += 1
+        position = self.index_of(entry_id)
+        if position is not None:
+            self.unindex_hash(self.entries[position])
+        if entry is not None:
+            self.share_points(entry)
+            self.index_hash(entry)
+        if position is not None:
+            if entry is None:
+                del self.entries[position]
+                self.positions = None
+            else:
+                self.entries[position] = entry
+        elif entry is not None:
+            self.positions[entry_id] = len(self.entries)
+            self.entries.append(entry)
+
+    # Function to drop local edits that clash with another user's change, keeping theirs
+    def discard_conflicts(self):
+        for entry_id, entry in self.conflicts.items():
+            self.pending.pop(entry_id, None)
+            self.originals.pop(entry_id, None)
+            self.put_entry(entry_id, entry)
+        self.conflicts = {}
 
     def calculate_average(self, data_points):
         if not data_points:
@@ -118,9 +495,12 @@ def add_entry(manager, tree):
             messagebox.showerror("Input Error", error_message)
             return
 
-        manager.add_entry(experiment_name, date, researcher, list(map(float, data_points.split(','))))
-        manager.save_entries_to_file()
-        refresh_table(manager, tree)
+        try:
+            manager.add_entry(experiment_name, date, researcher, list(map(float, data_points.split(','))))
+        except ValueError as error:
+            messagebox.showerror("Input Error", str(error))
+            return
+        save_changes(manager, tree)
         add_window.destroy()
 
     add_window = tk.Toplevel()
@@ -150,8 +530,10 @@ def update_entry(manager, tree):
     if not selected_item:
         return
 
-    item_index = tree.index(selected_item[0])
-    entry = manager.get_entries()[item_index]
+    indices = selected_indices(manager, tree)
+    if indices is None:
+        return
+    entry = manager.get_entries()[indices[0]]
 
     def submit():
         experiment_name = experiment_name_var.get().strip()
@@ -164,28 +546,37 @@ def update_entry(manager, tree):
             messagebox.showerror("Input Error", error_message)
             return
 
-        manager.update_entry(item_index, experiment_name, date, researcher, list(map(float, data_points.split(','))))
-        manager.save_entries_to_file()
-        refresh_table(manager, tree)
+        # Other users' changes may have moved the entry while the dialog was open
+        item_index = manager.index_of(entry.entry_id)
+        if item_index is None:
+            messagebox.showerror("Update Error", "The entry was deleted by another user.")
+            update_window.destroy()
+            return
+        try:
+            manager.update_entry(item_index, experiment_name, date, researcher, list(map(float, data_points.split(','))))
+        except ValueError as error:
+            messagebox.showerror("Input Error", str(error))
+            return
+        save_changes(manager, tree)
         update_window.destroy()
 
     update_window = tk.Toplevel()
     update_window.title("Update Research Entry")
 
     tk.Label(update_window, text="Experiment Name:").grid(row=0, column=0, padx=10, pady=5)
-    experiment_name_var = tk.StringVar(value=entry['experiment_name'])
+    experiment_name_var = tk.StringVar(value=entry.experiment_name)
     tk.Entry(update_window, textvariable=experiment_name_var).grid(row=0, column=1, padx=10, pady=5)
 
     tk.Label(update_window, text="Date (YYYY-MM-DD):").grid(row=1, column=0, padx=10, pady=5)
-    date_var = tk.StringVar(value=entry['date'])
+    date_var = tk.StringVar(value=entry.date)
     tk.Entry(update_window, textvariable=date_var).grid(row=1, column=1, padx=10, pady=5)
 
     tk.Label(update_window, text="Researcher:").grid(row=2, column=0, padx=10, pady=5)
-    researcher_var = tk.StringVar(value=entry['researcher'])
+    researcher_var = tk.StringVar(value=entry.researcher)
     tk.Entry(update_window, textvariable=researcher_var).grid(row=2, column=1, padx=10, pady=5)
 
     tk.Label(update_window, text="Data Points (comma-separated):").grid(row=3, column=0, padx=10, pady=5)
-    data_points_var = tk.StringVar(value=','.join(map(str, entry['data_points'])))
+    data_points_var = tk.StringVar(value=','.join(map(str, entry.data_points)))
     tk.Entry(update_window, textvariable=data_points_var).grid(row=3, column=1, padx=10, pady=5)
 
     tk.Button(update_window, text="Submit", command=submit).grid(row=4, column=0, columnspan=2, pady=10)
@@ -196,17 +587,53 @@ def delete_entry(manager, tree):
     if not selected_item:
         return
 
-    item_index = tree.index(selected_item[0])
-    manager.delete_entry(item_index)
-    manager.save_entries_to_file()
+    indices = selected_indices(manager, tree)
+    if indices is None:
+        return
+    manager.delete_entry(indices[0])
+    save_changes(manager, tree)
+
+# Function to save changes, keeping the other user's version of conflicting entries
+def save_changes(manager, tree):
+    # Every conflict drops at least one local edit, so this ends once the rest is saved
+    while True:
+        try:
+            dropped = manager.save_entries_to_file()
+            if dropped:
+                messagebox.showinfo("Duplicate Entries", f"{len(dropped)} new entries were not saved because another user saved identical ones.")
+            break
+        except ConflictError as error:
+            messagebox.showwarning("Save Conflict", f"{error}\nTheir version has been kept; please reapply your change to those entries.")
+            manager.discard_conflicts()
+        except ValueError as error:
+            messagebox.showerror("Save Error", f"{error}\nNothing was saved; please correct the entry and save again.")
+            break
     refresh_table(manager, tree)
 
-# Function to refresh the table
+# Function to reload entries changed by other users and refresh the table
+def reload_changes(manager, tree, always_refresh=False):
+    if manager.refresh() or always_refresh:
+        refresh_table(manager, tree)
+
+# Function to refresh the table. Rows are identified by entry id, so the
+# selection survives refreshes and is found again however the rows are ordered.
 def refresh_table(manager, tree):
+    selected = tree.selection()
     for i in tree.get_children():
         tree.delete(i)
     for entry in manager.get_entries():
-        tree.insert('', 'end', values=(entry['experiment_name'], entry['date'], entry['researcher'], ','.join(map(str, entry['data_points']))))
+        tree.insert('', 'end', iid=entry.entry_id, values=(entry.experiment_name, entry.date, entry.researcher, ','.join(map(str, entry.data_points))))
+    tree.selection_set([item for item in selected if tree.exists(item)])
+
+# Function to get the positions in the manager of the selected entries.
+# Returns None, after telling the user, if one was deleted by another user.
+def selected_indices(manager, tree):
+    indices = [manager.index_of(item) for item in tree.selection()]
+    if None in indices:
+        messagebox.showinfo("Entry Deleted", "The selected entry was deleted by another user.")
+        refresh_table(manager, tree)
+        return None
+    return indices
 
 # Function to sort the table
 def sort_by_column(tree, col, descending):
@@ -217,34 +644,138 @@ def sort_by_column(tree, col, descending):
     tree.heading(col, command=lambda: sort_by_column(tree, col, not descending))
 
 # Function to analyze the entries
-def analyze_entry(manager, tree):
+# Statistics are computed on a worker thread so large entries do not freeze the window.
+def analyze_entry(manager, quality, tree):
     selected_item = tree.selection()
     if not selected_item:
         return
 
-    item_index = tree.index(selected_item[0])
-    entry = manager.get_entries()[item_index]
-    data_points = entry['data_points']
+    indices = selected_indices(manager, tree)
+    if indices is None:
+        return
+    entry = manager.get_entries()[indices[0]]
 
-    if not data_points:
+    if not entry.data_points:
         messagebox.showinfo("Analysis", "No data points available for analysis.")
         return
 
-    average = manager.calculate_average(data_points)
-    std_dev = manager.calculate_standard_deviation(data_points)
-    median = manager.calculate_median(data_points)
+    results = queue.Queue()
+    threading.Thread(target=analysis_worker, args=(quality, entry, results), daemon=True).start()
+    tree.config(cursor="watch")
+    poll_analysis(tree, entry, results)
 
+# Function run by the analysis worker thread: describes the raw and clean points of an entry
+def analysis_worker(quality, entry, results):
+    try:
+        # Large entries are split across worker processes by describe
+        raw = describe(entry.data_points)
+        with quality_lock:
+            mask = quality.scan(entry)
+        results.put((raw, mask, describe(mask.clean(entry.data_points))))
+    except Exception as error:
+        results.put(error)
+
+# Function to show the results of an analysis on the Tk thread once the worker has finished
+def poll_analysis(tree, entry, results):
+    try:
+        result = results.get_nowait()
+    except queue.Empty:
+        tree.after(ANALYSIS_POLL_MS, poll_analysis, tree, entry, results)
+        return
+    tree.config(cursor="")
+    if isinstance(result, Exception):
+        messagebox.showerror("Analysis Error", str(result))
+        return
+
+    raw, mask, clean = result
     analysis_message = (
-        f"Analysis of {entry['experiment_name']}:\n\n"
-        f"Average: {average:.2f}\n"
-        f"Standard Deviation: {std_dev:.2f}\n"
-        f"Median: {median:.2f}"
+        f"Analysis of {entry.experiment_name}:\n\n"
+        f"Raw - Average: {raw['mean']:.2f}, Standard Deviation: {raw['std']:.2f}, Median: {raw['median']:.2f}\n"
+        f"Quality: {mask.summary()}\n"
     )
-    messagebox.showinfo("Analysis Results", analysis_message)
+    if clean:
+        analysis_message += (
+            f"Clean - Average: {clean['mean']:.2f}, "
+            f"Standard Deviation: {clean['std']:.2f}, "
+            f"Median: {clean['median']:.2f}"
+        )
+    else:
+        analysis_message += "Clean - No data points passed the quality scan."
+    ChartWindow(f"Analysis Results - {entry.experiment_name}", entry.data_points, analysis_message)
+
+# Function to compare entries: Welch t-test for two selected entries,
+# one-way ANOVA across the selected entry's experiment otherwise
+def compare_entries(comparison, tree):
+    selected_items = tree.selection()
+    if not selected_items:
+        return
+
+    indices = selected_indices(comparison.manager, tree)
+    if indices is None:
+        return
+    entries = comparison.manager.get_entries()
+    if len(indices) == 2:
+        first_index, second_index = indices
+        t, df, p = comparison.welch_t_test(first_index, second_index)
+        comparison_message = (
+            f"Welch t-test: {entries[first_index].experiment_name} vs {entries[second_index].experiment_name}\n\n"
+            f"t: {t:.4f}\n"
+            f"Degrees of Freedom: {df:.2f}\n"
+            f"p-value: {p:.4g}"
+        )
+    else:
+        experiment_name = entries[indices[0]].experiment_name
+        result = comparison.anova(experiment_name)
+        if result is None:
+            messagebox.showinfo("Comparison", f"At least two entries of {experiment_name} with two or more data points are needed.")
+            return
+        f, df_between, df_within, p = result
+        comparison_message = (
+            f"One-way ANOVA across {experiment_name}:\n\n"
+            f"F({df_between}, {df_within}): {f:.4f}\n"
+            f"p-value: {p:.4g}"
+        )
+    messagebox.showinfo("Comparison Results", comparison_message)
+
+# File types offered when exporting or importing entries
+EXPORT_FILE_TYPES = [("NumPy archive", "*.npz"), ("Arrow IPC", "*.arrow"), ("Parquet", "*.parquet")]
+
+# Function to export all entries to a columnar file
+def export_data(manager):
+    filename = filedialog.asksaveasfilename(title="Export Entries", defaultextension=".npz", filetypes=EXPORT_FILE_TYPES)
+    if not filename:
+        return
+
+    try:
+        export_entries(manager.get_entries(), filename)
+    except (ImportError, ValueError, OSError) as error:
+        messagebox.showerror("Export Error", str(error))
+        return
+    messagebox.showinfo("Export", f"Exported {len(manager.get_entries())} entries to {filename}.")
+
+# Function to import entries from an exported file, skipping duplicates
+def import_data(manager, tree):
+    filename = filedialog.askopenfilename(title="Import Entries", filetypes=EXPORT_FILE_TYPES)
+    if not filename:
+        return
+
+    try:
+        added, skipped = import_into(manager, filename)
+    except (ImportError, ValueError, OSError, zipfile.BadZipFile) as error:
+        messagebox.showerror("Import Error", str(error))
+        return
+    except KeyError as error:
+        # A .npz file that is not an export of this program lacks its columns
+        messagebox.showerror("Import Error", f"{filename} is not an export of research entries (missing {error}).")
+        return
+    save_changes(manager, tree)
+    messagebox.showinfo("Import", f"Imported {added} entries, skipped {skipped} duplicates.")
 
 # Main function
 def main():
     manager = ResearchDataManager()
+    comparison = ComparisonEngine(manager)
+    quality = QualityScanner(filename=manager.filename)
 
     root = tk.Tk()
     root.title("Research Data Manager")
@@ -272,19 +803,28 @@ def main():
         for i in tree.get_children():
             tree.delete(i)
         for entry in manager.get_entries():
-            if query in entry['experiment_name'].lower() or query in entry['date'].lower() or query in entry['researcher'].lower():
-                tree.insert('', 'end', values=(entry['experiment_name'], entry['date'], entry['researcher'], ','.join(map(str, entry['data_points']))))
+            if query in entry.experiment_name.lower() or query in entry.date.lower() or query in entry.researcher.lower():
+                tree.insert('', 'end', iid=entry.entry_id, values=(entry.experiment_name, entry.date, entry.researcher, ','.join(map(str, entry.data_points))))
 
     search_var.trace('w', search)
     
     tk.Button(root, text="Add Entry", command=lambda: add_entry(manager, tree)).pack(side=tk.LEFT, padx=10)
     tk.Button(root, text="Update Entry", command=lambda: update_entry(manager, tree)).pack(side=tk.LEFT, padx=10)
     tk.Button(root, text="Delete Entry", command=lambda: delete_entry(manager, tree)).pack(side=tk.LEFT, padx=10)
-    tk.Button(root, text="Analyze Entry", command=lambda: analyze_entry(manager, tree)).pack(side=tk.LEFT, padx=10)
-    tk.Button(root, text="Refresh", command=lambda: refresh_table(manager, tree)).pack(side=tk.LEFT, padx=10)
+    tk.Button(root, text="Analyze Entry", command=lambda: analyze_entry(manager, quality, tree)).pack(side=tk.LEFT, padx=10)
+    tk.Button(root, text="Compare Entries", command=lambda: compare_entries(comparison, tree)).pack(side=tk.LEFT, padx=10)
+    tk.Button(root, text="Export", command=lambda: export_data(manager)).pack(side=tk.LEFT, padx=10)
+    tk.Button(root, text="Import", command=lambda: import_data(manager, tree)).pack(side=tk.LEFT, padx=10)
+    tk.Button(root, text="Refresh", command=lambda: reload_changes(manager, tree, always_refresh=True)).pack(side=tk.LEFT, padx=10)
 
     refresh_table(manager, tree)
 
+    def poll_changes():
+        reload_changes(manager, tree)
+        root.after(REFRESH_INTERVAL_MS, poll_changes)
+
+    root.after(REFRESH_INTERVAL_MS, poll_changes)
+
     root.mainloop()
 
 if __name__ == "__main__":
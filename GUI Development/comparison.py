@@ -0,0 +1,168 @@
+import math
+import numpy as np
+
+# Iterations used by the continued fraction of the incomplete beta function
+BETA_ITERATIONS = 300
+BETA_EPSILON = 1e-15
+
+_lgamma = np.frompyfunc(math.lgamma, 1, 1)
+
+
+# Function to evaluate the regularized incomplete beta function I_x(a, b) element-wise
+def regularized_incomplete_beta(a, b, x):
+    a, b, x = np.broadcast_arrays(*(np.asarray(value, dtype=np.float64) for value in (a, b, x)))
+    result = np.full(a.shape, np.nan)
+    result[x <= 0] = 0.0
+    result[x >= 1] = 1.0
+    inside = (x > 0) & (x < 1) & (a > 0) & (b > 0)
+    if not inside.any():
+        return result
+
+    a, b, x = a[inside], b[inside], x[inside]
+    # The continued fraction converges quickly only below (a + 1) / (a + b + 2)
+    flipped = x > (a + 1) / (a + b + 2)
+    a, b = np.where(flipped, b, a), np.where(flipped, a, b)
+    x = np.where(flipped, 1 - x, x)
+
+    log_front = (_lgamma(a + b) - _lgamma(a) - _lgamma(b)).astype(np.float64) + a * np.log(x) + b * np.log1p(-x)
+    tiny = 1e-300
+    c = np.ones_like(x)
+    d = 1 - (a + b) * x / (a + 1)
+    d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+    fraction = d.copy()
+    for m in range(1, BETA_ITERATIONS + 1):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1 + numerator * d
+            d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+            c = 1 + numerator / c
+            c = np.where(np.abs(c) < tiny, tiny, c)
+            delta = c * d
+            fraction *= delta
+        if np.all(np.abs(delta - 1) < BETA_EPSILON):
+            break
+
+    value = np.exp(log_front) * fraction / a
+    result[inside] = np.where(flipped, 1 - value, value)
+    return result
+
+
+# Function to get the two-sided p-value of Student's t distribution
+def t_test_p_value(t, df):
+    t = np.asarray(t, dtype=np.float64)
+    df = np.asarray(df, dtype=np.float64)
+    return regularized_incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+# Function to get the upper tail p-value of the F distribution
+def f_test_p_value(f, df_between, df_within):
+    f = np.asarray(f, dtype=np.float64)
+    return regularized_incomplete_beta(df_within / 2.0, df_between / 2.0, df_within / (df_within + df_between * f))
+
+
+# Class comparing research data entries with each other.
+# Only the count, mean and variance of each entry are cached, keyed by entry id
+# and checked against the entry's content hash, so repeated comparisons never
+# touch the raw points again and the cache never holds a copy of them.
+class ComparisonEngine:
+    def __init__(self, manager):
+        self.manager = manager
+        # Entry id -> (content hash, count, mean, sample variance)
+        self.cache = {}
+        self.revision = None
+
+    # Function to get the cached count, mean and sample variance of an entry
+    def _cached(self, entry):
+        cached = self.cache.get(entry.entry_id)
+        if cached is None or cached[0] != entry.content_hash:
+            values = np.asarray(entry.data_points, dtype=np.float64)
+            n = len(values)
+            mean = values.mean() if n else np.nan
+            variance = values.var(ddof=1) if n > 1 else np.nan
+            cached = (entry.content_hash, n, mean, variance)
+            self.cache[entry.entry_id] = cached
+        return cached[1:]
+
+    # Function to drop cached statistics of deleted entries whenever the manager's entries changed
+    def prune(self):
+        if self.revision == self.manager.revision:
+            return
+        self.revision = self.manager.revision
+        live = {entry.entry_id for entry in self.manager.get_entries()}
+        for key in [key for key in self.cache if key not in live]:
+            del self.cache[key]
+
+    # Function to get the NumPy array of an entry's data points
+    def array(self, index):
+        return np.asarray(self.manager.get_entries()[index].data_points, dtype=np.float64)
+
+    # Function to get count, mean and sample variance vectors for a list of entry indices
+    def statistics(self, indices=None):
+        self.prune()
+        entries = self.manager.get_entries()
+        if indices is None:
+            indices = range(len(entries))
+        stats = [self._cached(entries[i]) for i in indices]
+        if not stats:
+            return np.empty(0), np.empty(0), np.empty(0)
+        counts, means, variances = (np.array(column, dtype=np.float64) for column in zip(*stats))
+        return counts, means, variances
+
+    # Function to run Welch's t-test for many pairs of entries at once
+    def welch_t_tests(self, pairs):
+        pairs = np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+        # Only the entries taking part in a pair are looked at
+        indices, positions = np.unique(pairs, return_inverse=True)
+        positions = positions.reshape(-1, 2)
+        counts, means, variances = self.statistics(indices)
+        n1, n2 = counts[positions[:, 0]], counts[positions[:, 1]]
+        s1, s2 = variances[positions[:, 0]] / n1, variances[positions[:, 1]] / n2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (means[positions[:, 0]] - means[positions[:, 1]]) / np.sqrt(s1 + s2)
+            df = (s1 + s2) ** 2 / (s1 ** 2 / (n1 - 1) + s2 ** 2 / (n2 - 1))
+        return t, df, t_test_p_value(t, df)
+
+    # Function to run Welch's t-test between two entries
+    def welch_t_test(self, first_index, second_index):
+        t, df, p = self.welch_t_tests([(first_index, second_index)])
+        return float(t[0]), float(df[0]), float(p[0])
+
+    # Function to run a one-way ANOVA over the given entries
+    def anova_indices(self, indices):
+        counts, means, variances = self.statistics(indices)
+        usable = counts > 1
+        counts, means, variances = counts[usable], means[usable], variances[usable]
+        groups = len(counts)
+        total = counts.sum()
+        if groups < 2 or total <= groups:
+            return None
+        grand_mean = (counts * means).sum() / total
+        between = (counts * (means - grand_mean) ** 2).sum()
+        within = ((counts - 1) * variances).sum()
+        df_between, df_within = groups - 1, total - groups
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = (between / df_between) / (within / df_within)
+        return float(f), int(df_between), int(df_within), float(f_test_p_value(f, df_between, df_within))
+
+    # Function to run a one-way ANOVA across all entries of an experiment name
+    def anova(self, experiment_name):
+        indices = [i for i, entry in enumerate(self.manager.get_entries()) if entry.experiment_name == experiment_name]
+        return self.anova_indices(indices)
+
+    # Function to get the correlation matrix of equal-length entries
+    def correlation_matrix(self, indices):
+        arrays = [self.array(i) for i in indices]
+        if len({len(values) for values in arrays}) > 1:
+            raise ValueError("Correlation requires entries with the same number of data points.")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.corrcoef(np.vstack(arrays))
+
+    # Function to get a correlation matrix for every group of equal-length entries
+    def correlation_matrices(self):
+        groups = {}
+        for i, entry in enumerate(self.manager.get_entries()):
+            if len(entry.data_points) > 1:
+                groups.setdefault(len(entry.data_points), []).append(i)
+        return {length: (indices, self.correlation_matrix(indices)) for length, indices in groups.items() if len(indices) > 1}
@@ -0,0 +1,213 @@
+import os
+import zipfile
+from array import array
+import numpy as np
+from research_entry import ResearchEntry
+from storage import DuplicateEntryError
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Number of entries converted at a time, so exports never hold a full copy of the dataset
+EXPORT_CHUNK_ENTRIES = 10000
+# Number of values read at a time from an exported .npy member
+IMPORT_CHUNK_VALUES = 1 << 20
+# Text columns exported next to the data points and the version
+TEXT_COLUMNS = ('entry_id', 'experiment_name', 'date', 'researcher', 'content_hash')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+
+
+# Function to split a list of entries into chunks
+def iter_chunks(entries, chunk_size=EXPORT_CHUNK_ENTRIES):
+    for start in range(0, len(entries), chunk_size):
+        yield entries[start:start + chunk_size]
+
+
+# Function to get the number of points of each entry in a chunk
+def chunk_lengths(chunk):
+    return np.fromiter((len(entry.data_points) for entry in chunk), dtype=np.int64, count=len(chunk))
+
+
+# Function to pack the points of a chunk of entries into one values array plus lengths
+def pack_chunk(chunk):
+    values = np.concatenate([np.asarray(entry.data_points, dtype=np.float64) for entry in chunk]) if chunk else np.empty(0)
+    return values, chunk_lengths(chunk)
+
+
+# Function to write one .npy member of an archive chunk by chunk
+def write_npy(archive, name, dtype, length, chunks):
+    with archive.open(name + '.npy', 'w', force_zip64=True) as member:
+        np.lib.format.write_array_header_2_0(member, {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False, 'shape': (length,)})
+        for chunk in chunks:
+            member.write(np.ascontiguousarray(chunk, dtype=dtype).tobytes())
+
+
+# Function to read one .npy member of an archive chunk by chunk
+def read_npy(archive, name, chunk_items=IMPORT_CHUNK_VALUES):
+    with archive.open(name + '.npy') as member:
+        version = np.lib.format.read_magic(member)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, _, dtype = read_header(member)
+        remaining = shape[0]
+        while remaining > 0:
+            count = min(chunk_items, remaining)
+            yield np.frombuffer(member.read(count * dtype.itemsize), dtype=dtype)
+            remaining -= count
+
+
+# Function to export entries to a NumPy .npz archive: all points concatenated in
+# data_points, entry i owning data_points[offsets[i]:offsets[i + 1]], plus one
+# array per metadata column
+def export_npz(entries, filename, chunk_size=EXPORT_CHUNK_ENTRIES):
+    total_points = sum(len(entry.data_points) for entry in entries)
+    widths = {column: max((len(getattr(entry, column)) for entry in entries), default=0) or 1 for column in TEXT_COLUMNS}
+
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        write_npy(archive, 'data_points', '<f8', total_points, (pack_chunk(chunk)[0] for chunk in iter_chunks(entries, chunk_size)))
+
+        def offset_chunks():
+            end = 0
+            yield np.zeros(1, dtype=np.int64)
+            for chunk in iter_chunks(entries, chunk_size):
+                offsets = end + np.cumsum(chunk_lengths(chunk))
+                end = int(offsets[-1])
+                yield offsets
+
+        write_npy(archive, 'offsets', '<i8', len(entries) + 1, offset_chunks())
+        write_npy(archive, 'version', '<i8', len(entries), ([entry.version for entry in chunk] for chunk in iter_chunks(entries, chunk_size)))
+        for column in TEXT_COLUMNS:
+            write_npy(archive, column, f'<U{widths[column]}', len(entries), ([getattr(entry, column) for entry in chunk] for chunk in iter_chunks(entries, chunk_size)))
+
+
+# Function to read the entries of a .npz export one at a time
+def import_npz(filename):
+    with zipfile.ZipFile(filename) as archive:
+        columns = {column: np.load(archive.open(column + '.npy')) for column in TEXT_COLUMNS + ('version', 'offsets')}
+        offsets = columns['offsets']
+        values = read_npy(archive, 'data_points')
+        chunk = np.empty(0)
+        start = 0
+        for i in range(len(offsets) - 1):
+            length = int(offsets[i + 1] - offsets[i])
+            # Points are copied chunk by chunk into an array of the entry's final size
+            points = np.empty(length, dtype=np.float64)
+            filled = 0
+            while filled < length:
+                if start == len(chunk):
+                    chunk, start = next(values), 0
+                count = min(length - filled, len(chunk) - start)
+                points[filled:filled + count] = chunk[start:start + count]
+                filled += count
+                start += count
+            yield ResearchEntry(
+                str(columns['experiment_name'][i]),
+                str(columns['date'][i]),
+                str(columns['researcher'][i]),
+                array('d', points.tobytes()),
+                str(columns['entry_id'][i]),
+                int(columns['version'][i]),
+                str(columns['content_hash'][i])
+            )
+
+
+# Function to get the Arrow schema of exported entries
+def arrow_schema():
+    return pa.schema(
+        [(column, pa.string()) for column in TEXT_COLUMNS]
+        + [('version', pa.int64()), ('data_points', pa.large_list(pa.float64()))]
+    )
+
+
+# Function to convert a chunk of entries into an Arrow record batch
+def arrow_batch(chunk):
+    values, lengths = pack_chunk(chunk)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    arrays = [pa.array([getattr(entry, column) for entry in chunk], type=pa.string()) for column in TEXT_COLUMNS]
+    arrays += [pa.array([entry.version for entry in chunk], type=pa.int64()), pa.LargeListArray.from_arrays(pa.array(offsets), pa.array(values))]
+    return pa.RecordBatch.from_arrays(arrays, schema=arrow_schema())
+
+
+# Function to export entries to an Arrow IPC file or, for .parquet, a Parquet file
+def export_arrow(entries, filename, chunk_size=EXPORT_CHUNK_ENTRIES):
+    if pa is None:
+        raise ImportError("pyarrow is needed to export Arrow and Parquet files; use .npz instead.")
+    if filename.lower().endswith('.parquet'):
+        with pq.ParquetWriter(filename, arrow_schema()) as writer:
+            for chunk in iter_chunks(entries, chunk_size):
+                writer.write_batch(arrow_batch(chunk))
+    else:
+        with pa.OSFile(filename, 'wb') as sink, pa.ipc.new_file(sink, arrow_schema()) as writer:
+            for chunk in iter_chunks(entries, chunk_size):
+                writer.write_batch(arrow_batch(chunk))
+
+
+# Function to read the entries of an Arrow or Parquet export one batch at a time
+def import_arrow(filename, chunk_size=EXPORT_CHUNK_ENTRIES):
+    if pa is None:
+        raise ImportError("pyarrow is needed to import Arrow and Parquet files.")
+    if filename.lower().endswith('.parquet'):
+        batches = pq.ParquetFile(filename).iter_batches(batch_size=chunk_size)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(filename))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+    for batch in batches:
+        data_points = batch.column('data_points')
+        offsets = data_points.offsets.to_numpy()
+        values = data_points.flatten().to_numpy(zero_copy_only=False)
+        offsets = offsets - offsets[0]
+        columns = {column: batch.column(column).to_pylist() for column in TEXT_COLUMNS + ('version',)}
+        for i in range(batch.num_rows):
+            yield ResearchEntry(
+                columns['experiment_name'][i],
+                columns['date'][i],
+                columns['researcher'][i],
+                array('d', values[offsets[i]:offsets[i + 1]].astype(np.float64).tobytes()),
+                columns['entry_id'][i],
+                columns['version'][i],
+                columns['content_hash'][i]
+            )
+
+
+# Function to export entries, picking the format from the file extension
+def export_entries(entries, filename, chunk_size=EXPORT_CHUNK_ENTRIES):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.npz':
+        export_npz(entries, filename, chunk_size)
+    elif extension == '.parquet' or extension in ARROW_EXTENSIONS:
+        export_arrow(entries, filename, chunk_size)
+    else:
+        raise ValueError(f"Unsupported export format: {extension or filename}.")
+
+
+# Function to read the entries of an export, picking the format from the file extension
+def import_entries(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.npz':
+        return import_npz(filename)
+    if extension == '.parquet' or extension in ARROW_EXTENSIONS:
+        return import_arrow(filename)
+    raise ValueError(f"Unsupported import format: {extension or filename}.")
+
+
+# Function to add the entries of an export to a manager, skipping duplicates.
+# Returns the number of entries added and skipped. If any entry cannot be added,
+# the entries added before it are taken back and the error is raised.
+def import_into(manager, filename):
+    added_ids = []
+    skipped = 0
+    try:
+        for entry in import_entries(filename):
+            try:
+                manager.add_entry(entry.experiment_name, entry.date, entry.researcher, entry.data_points)
+                added_ids.append(manager.get_entries()[-1].entry_id)
+            except DuplicateEntryError:
+                skipped += 1
+    except BaseException:
+        # A failed import adds nothing, so the next save does not commit half of it
+        manager.discard_new_entries(added_ids)
+        raise
+    return len(added_ids), skipped
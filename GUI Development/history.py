@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import datetime
+from bisect import bisect_right
+import numpy as np
+from storage import DEFAULT_ENCODING, TEXT_FIELDS, complete_length, diff_points, patch_points, quantize_points, entry_from_json, entry_to_json, write_file_atomically
+
+# An entry's history gets a full snapshot at least once every this many versions,
+# so rebuilding any version reads at most this many records
+HISTORY_SNAPSHOT_INTERVAL = 16
+
+
+# Function to turn index items into lines of the index file
+def index_data(items):
+    return b''.join(f"{entry_id} {version} {saved!r} {offset} {length} {kind}\n".encode('ascii') for entry_id, version, saved, offset, length, kind in items)
+
+
+# Class keeping the history of every entry in an append-only file next to the data file.
+# Each line is one JSON record of a saved version: a full snapshot of the entry,
+# a delta against the previous version (changed fields and point diffs) or a
+# deletion marker. Records are indexed by position in the file, so rebuilding a
+# version reads only the records since the entry's last snapshot. The positions
+# are kept in a second, compact file (one line per record: entry id, version,
+# save time, offset, length and kind), so finding a version never parses snapshots.
+class History:
+    def __init__(self, filename):
+        self.filename = filename + ".history"
+        self.index_filename = self.filename + ".index"
+        # Entry id -> (save times, [(version, file offset, deleted, position of the snapshot it builds on)])
+        self.index = {}
+        # Offsets of the history and of the index file read so far
+        self.offset = 0
+        self.index_offset = 0
+        # Offset of the history up to which the index file covers it
+        self.indexed = 0
+        # (entry id, version, save time, offset, length, kind) of the records past self.indexed
+        self.unindexed = []
+
+    # Function to add a record to the in-memory index; kind is 'snapshot', 'delta' or 'deleted'
+    def add(self, entry_id, version, saved, offset, length, kind):
+        times, items = self.index.setdefault(entry_id, ([], []))
+        snapshot = items[-1][3] if kind == 'delta' else len(items)
+        times.append(saved)
+        items.append((version, offset, kind == 'deleted', snapshot))
+        self.offset = offset + length
+
+    # Function to list every record read so far as index items, in file order
+    def index_items(self):
+        records = sorted(
+            (offset, entry_id, version, saved, 'deleted' if deleted else 'snapshot' if snapshot == position else 'delta')
+            for entry_id, (times, items) in self.index.items()
+            for position, (saved, (version, offset, deleted, snapshot)) in enumerate(zip(times, items))
+        )
+        ends = [record[0] for record in records[1:]] + [self.offset]
+        return [(entry_id, version, saved, offset, end - offset, kind) for (offset, entry_id, version, saved, kind), end in zip(records, ends)]
+
+    # Function to index the records appended since the last read: from the index
+    # file as far as it goes, then from the history lines it does not cover yet
+    # (those saved before the index existed, or just before a crash)
+    def refresh(self):
+        if not os.path.exists(self.filename):
+            return
+        size = os.path.getsize(self.index_filename) if os.path.exists(self.index_filename) else 0
+        if size < self.index_offset:
+            # The index was removed or replaced, so the next save writes all of it again
+            self.index_offset = self.indexed = 0
+            self.unindexed = self.index_items()
+        if size > self.index_offset:
+            with open(self.index_filename, 'rb') as file:
+                file.seek(self.index_offset)
+                for line in file:
+                    # A torn last line is what a crash in the middle of an append leaves behind
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        entry_id, version, saved, offset, length, kind = line.decode('ascii').split()
+                        offset, length = int(offset), int(length)
+                        item = (entry_id, int(version), float(saved), offset, length, kind)
+                    except ValueError:
+                        break
+                    if offset > self.offset:
+                        # The index does not follow on from what was read; the history is read instead
+                        break
+                    if offset == self.offset:
+                        self.add(*item)
+                    self.indexed = offset + length
+                    self.index_offset += len(line)
+            self.unindexed = [item for item in self.unindexed if item[3] >= self.indexed]
+        with open(self.filename, 'rb') as file:
+            file.seek(self.offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                kind = 'deleted' if record.get('deleted') else 'delta' if 'delta' in record else 'snapshot'
+                item = (record['entry_id'], record['version'], record['time'], self.offset, len(line), kind)
+                self.unindexed.append(item)
+                self.add(*item)
+
+    # Function to record saved change records {entry_id, version, entry}.
+    # originals holds the entries as they were before the local edits, which
+    # become the first snapshot of entries saved before history was kept.
+    # The caller holds the data file lock.
+    def record(self, records, originals):
+        self.refresh()
+        now = time.time()
+        lines = []
+        for record in records:
+            entry_id, entry = record['entry_id'], record['entry']
+            original = originals.get(entry_id)
+            times, items = self.index.get(entry_id, ([], []))
+            if not items and original is not None:
+                # Entries from before history was kept count as having always existed
+                lines.append({'entry_id': entry_id, 'version': original.version, 'time': 0.0, 'snapshot': entry_to_json(original)})
+                times, items = [0.0], [(original.version, None, False, 0)]
+            # Times only move forward per entry, even if clocks of other machines disagree
+            line = {'entry_id': entry_id, 'version': record['version'], 'time': max([now] + times[-1:])}
+            if entry is None:
+                line['deleted'] = True
+            elif (original is not None and items and not items[-1][2] and items[-1][0] == original.version
+                    and len(items) - items[-1][3] < HISTORY_SNAPSHOT_INTERVAL):
+                line['delta'] = {field: getattr(entry, field) for field in TEXT_FIELDS if getattr(entry, field) != getattr(original, field)}
+                line['content_hash'] = entry.content_hash
+                points = diff_points(original.data_points, entry.data_points)
+                if points is not None:
+                    line['points'] = points
+            else:
+                line['snapshot'] = entry_to_json(entry)
+            lines.append(line)
+        if not lines:
+            return
+
+        data = [json.dumps(line).encode('utf-8') + b'\n' for line in lines]
+        with open(self.filename, 'a+b') as file:
+            file.truncate(complete_length(file))
+            offset = file.seek(0, os.SEEK_END)
+            file.write(b''.join(data))
+            file.flush()
+            os.fsync(file.fileno())
+        for line, raw in zip(lines, data):
+            kind = 'deleted' if line.get('deleted') else 'delta' if 'delta' in line else 'snapshot'
+            item = (line['entry_id'], line['version'], line['time'], offset, len(raw), kind)
+            self.unindexed.append(item)
+            self.add(*item)
+            offset += len(raw)
+        self.write_index()
+
+    # Function to add the records past self.indexed to the index file (the caller
+    # holds the data file lock). The history is synced first, so the index never
+    # points past it. The index itself is not synced here: records it loses in a
+    # crash are read from the history instead, until the next save adds them again.
+    def write_index(self):
+        with open(self.index_filename, 'a+b') as file:
+            matches = complete_length(file) == self.index_offset
+            if matches:
+                file.truncate(self.index_offset)
+                file.seek(0, os.SEEK_END)
+                file.write(index_data(self.unindexed))
+        if not matches:
+            # The index does not match the history, so it is written again from the start
+            write_file_atomically(self.index_filename, index_data(self.index_items()))
+            self.index_offset = self.indexed = 0
+        self.refresh()
+
+    # Function to sync the index file to disk, which the manager does when it checkpoints
+    def sync(self):
+        if os.path.exists(self.index_filename):
+            with open(self.index_filename, 'ab') as file:
+                os.fsync(file.fileno())
+
+    # Function to rebuild the entry recorded at a position of an entry's history (None if deleted)
+    def rebuild(self, entry_id, position):
+        items = self.index[entry_id][1]
+        version, _, deleted, snapshot = items[position]
+        if deleted:
+            return None
+        with open(self.filename, 'rb') as file:
+            file.seek(items[snapshot][1])
+            entry = entry_from_json(json.loads(file.readline())['snapshot'])
+            points = np.asarray(entry.data_points, dtype=np.float64)
+            for _, offset, _, _ in items[snapshot + 1:position + 1]:
+                file.seek(offset)
+                record = json.loads(file.readline())
+                for field, value in record['delta'].items():
+                    setattr(entry, field, value)
+                if 'points' in record:
+                    points = patch_points(points, record['points'])
+                entry.content_hash = record['content_hash']
+        entry.data_points = quantize_points(points, DEFAULT_ENCODING)
+        entry.version = version
+        return entry
+
+    # Function to get the saved versions of an entry as (version, save time, deleted) tuples
+    def versions(self, entry_id):
+        self.refresh()
+        times, items = self.index.get(entry_id, ([], []))
+        return [(version, datetime.datetime.fromtimestamp(saved), deleted) for saved, (version, _, deleted, _) in zip(times, items)]
+
+    # Function to get an entry as it was at a version, or None if that version deleted it.
+    # Raises KeyError if the version was never recorded.
+    def entry_at_version(self, entry_id, version):
+        self.refresh()
+        items = self.index.get(entry_id, ([], []))[1]
+        for position in range(len(items) - 1, -1, -1):
+            if items[position][0] == version:
+                return self.rebuild(entry_id, position)
+        raise KeyError(f"Version {version} of entry {entry_id} is not in the history.")
+
+    # Function to get an entry as it was at a point in time (a datetime or a Unix
+    # timestamp), or None if it did not exist then
+    def entry_as_of(self, entry_id, when):
+        self.refresh()
+        if isinstance(when, datetime.datetime):
+            when = when.timestamp()
+        times = self.index.get(entry_id, ([], []))[0]
+        position = bisect_right(times, when) - 1
+        return self.rebuild(entry_id, position) if position >= 0 else None
+
+    # Function to get all entries with a history that existed at a point in time, in order of creation
+    def entries_as_of(self, when):
+        self.refresh()
+        entries = (self.entry_as_of(entry_id, when) for entry_id in list(self.index))
+        return [entry for entry in entries if entry is not None]
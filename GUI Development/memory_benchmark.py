@@ -0,0 +1,66 @@
+import sys
+import random
+import tracemalloc
+from research_entry import ResearchEntry
+
+DEFAULT_ENTRIES = 1_000_000
+POINTS_PER_ENTRY = 10
+EXPERIMENTS = [f"Experiment {i}" for i in range(100)]
+RESEARCHERS = [f"Researcher {i}" for i in range(20)]
+DATES = [f"2024-{month:02d}-{day:02d}" for month in range(1, 13) for day in range(1, 29)]
+
+
+# Function to generate the fields of an entry the way a file read produces them:
+# every string is a new object, even when its value repeats
+def fields(rng, i):
+    return (
+        "".join(rng.choice(EXPERIMENTS)),
+        "".join(rng.choice(DATES)),
+        "".join(rng.choice(RESEARCHERS)),
+        [rng.random() for _ in range(POINTS_PER_ENTRY)],
+        f"{i:032x}",
+    )
+
+
+# Function to build entries as the dicts with float lists used before ResearchEntry
+def build_dicts(count):
+    rng = random.Random(0)
+    entries = []
+    for i in range(count):
+        experiment_name, date, researcher, data_points, entry_id = fields(rng, i)
+        entries.append({
+            'experiment_name': experiment_name, 'date': date, 'researcher': researcher,
+            'data_points': data_points, 'entry_id': entry_id, 'version': 0, 'content_hash': '',
+        })
+    return entries
+
+
+# Function to build the same entries as ResearchEntry records
+def build_records(count):
+    rng = random.Random(0)
+    return [ResearchEntry(*fields(rng, i)) for i in range(count)]
+
+
+# Function to measure the memory held by the entries a builder returns
+def measure(builder, count):
+    tracemalloc.start()
+    entries = builder(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del entries
+    return current
+
+
+# Function to compare the memory of both representations
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ENTRIES
+    print(f"{count} entries of {POINTS_PER_ENTRY} points")
+    results = {}
+    for label, builder in (("dict + list", build_dicts), ("ResearchEntry", build_records)):
+        results[label] = measure(builder, count)
+        print(f"{label:>14}: {results[label] / 2 ** 20:8.1f} MiB, {results[label] / count:6.0f} bytes per entry")
+    print(f"ResearchEntry uses {results['ResearchEntry'] / results['dict + list']:.0%} of the memory of dicts.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+# Entries with fewer points than this are described in the calling process.
+# Measured: the serial pass takes about 20 ns per point, while the parallel path
+# costs about 50 ms to start the workers from the fork server (about 0.3 s more
+# the first time, to start the server) plus about 2.2 times the serial work split
+# across them (copy to shared memory, moments, median refinement), so with four
+# workers it only starts to pay off at around five million points.
+PARALLEL_CUTOFF = 5_000_000
+# Number of bins of the histogram sketch used to locate the median
+SKETCH_BINS = 4096
+# Candidates of the median are gathered and sorted once the target bin holds fewer values than this
+GATHER_LIMIT = 1 << 16
+
+
+# Function to attach to the shared points and get a worker's slice of them
+def _attach(name, length, start, stop):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray((length,), dtype=np.float64, buffer=shm.buf)[start:stop]
+
+
+# Function to compute the partial moments of a slice of the shared points
+def _moments(name, length, start, stop):
+    shm, values = _attach(name, length, start, stop)
+    try:
+        count = stop - start
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        return count, mean, m2, float(values.min()), float(values.max())
+    finally:
+        del values
+        shm.close()
+
+
+# Function to compute the histogram sketch of a slice of the shared points over [low, high),
+# or [low, high] when closed, along with the number of values below low
+def _sketch(name, length, start, stop, low, high, bins, closed):
+    shm, values = _attach(name, length, start, stop)
+    try:
+        below = int(np.count_nonzero(values < low))
+        inside = values[(values >= low) & ((values <= high) if closed else (values < high))]
+        return below, np.histogram(inside, bins=bins, range=(low, high))[0]
+    finally:
+        del values
+        shm.close()
+
+
+# Function to gather the values of a slice of the shared points that fall in [low, high), or [low, high] when closed
+def _gather(name, length, start, stop, low, high, closed):
+    shm, values = _attach(name, length, start, stop)
+    try:
+        return values[(values >= low) & ((values <= high) if closed else (values < high))].copy()
+    finally:
+        del values
+        shm.close()
+
+
+# Function to merge partial moments with Chan's parallel algorithm
+def merge_moments(partials):
+    count, mean, m2 = 0, 0.0, 0.0
+    for part_count, part_mean, part_m2 in partials:
+        total = count + part_count
+        delta = part_mean - mean
+        mean += delta * part_count / total
+        m2 += part_m2 + delta * delta * count * part_count / total
+        count = total
+    return count, mean, m2
+
+
+# Function to find the value of the given rank by refining the histogram sketch
+# of the workers until the bin holding it is small enough to sort
+def _select(pool, name, length, chunks, rank, low, high):
+    closed = True
+    below = 0
+    while True:
+        if np.nextafter(low, np.inf) >= high:
+            # Only low and high are left in the range
+            sketches = list(pool.map(_sketch, *_columns(name, length, chunks, low, high, 1, False)))
+            return low if rank < below + sum(int(sketch[1][0]) for sketch in sketches) else high
+        edges = np.linspace(low, high, SKETCH_BINS + 1)
+        # Ranges only a few floats wide cannot be split into SKETCH_BINS bins, so they are halved
+        bins = SKETCH_BINS if np.all(edges[:-1] < edges[1:]) else 2
+        edges = np.histogram_bin_edges([], bins=bins, range=(low, high))
+        sketches = list(pool.map(_sketch, *_columns(name, length, chunks, low, high, bins, closed)))
+        counts = sum(sketch[1] for sketch in sketches)
+        below = sum(sketch[0] for sketch in sketches)
+        cumulative = below + np.cumsum(counts)
+        target = int(np.searchsorted(cumulative, rank, side='right'))
+        closed = closed and target == bins - 1
+        low, high = float(edges[target]), float(edges[target + 1])
+        below = int(cumulative[target] - counts[target])
+        if counts[target] <= GATHER_LIMIT:
+            candidates = np.sort(np.concatenate(list(pool.map(_gather, *_columns(name, length, chunks, low, high, closed)))))
+            return float(candidates[rank - below])
+
+
+# Function to turn per-chunk arguments into the argument columns expected by pool.map
+def _columns(name, length, chunks, *arguments):
+    return ([name] * len(chunks), [length] * len(chunks), [start for start, _ in chunks], [stop for _, stop in chunks]) + tuple([argument] * len(chunks) for argument in arguments)
+
+
+# Function to describe a series in the calling process
+def describe_serial(values):
+    return {
+        'count': len(values),
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'median': float(np.median(values)),
+        'min': float(values.min()),
+        'max': float(values.max()),
+    }
+
+
+# Function to get the context worker processes are started with. Forking copies the
+# threads' locks in whatever state they are in, and the GUI runs worker threads, so
+# workers come from a fork server, or are spawned where there is none (Windows).
+def _context():
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    # The server imports numpy once, rather than every worker importing it on start
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+# Function to describe a series by splitting it across worker processes through shared memory
+def describe_parallel(values, workers):
+    length = len(values)
+    shm = shared_memory.SharedMemory(create=True, size=values.nbytes)
+    try:
+        np.ndarray((length,), dtype=np.float64, buffer=shm.buf)[:] = values
+        bounds = np.linspace(0, length, workers + 1).astype(np.int64)
+        chunks = [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        with ProcessPoolExecutor(max_workers=len(chunks), mp_context=_context()) as pool:
+            partials = list(pool.map(_moments, *_columns(shm.name, length, chunks)))
+            count, mean, m2 = merge_moments((part[0], part[1], part[2]) for part in partials)
+            low = float(np.min([part[3] for part in partials]))
+            high = float(np.max([part[4] for part in partials]))
+            if not (np.isfinite(low) and np.isfinite(high)):
+                # NaN or infinite points leave no finite range to sketch
+                median = float(np.median(values))
+            elif low == high:
+                median = low
+            else:
+                middle = [_select(pool, shm.name, length, chunks, rank, low, high) for rank in sorted({(length - 1) // 2, length // 2})]
+                median = sum(middle) / len(middle)
+        return {'count': count, 'mean': mean, 'std': (m2 / count) ** 0.5, 'median': median, 'min': low, 'max': high}
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# Function to get the count, mean, population standard deviation, median, minimum
+# and maximum of a series, using worker processes for series above the cutoff
+def describe(data_points, workers=None, cutoff=PARALLEL_CUTOFF):
+    values = np.asarray(data_points, dtype=np.float64)
+    if not len(values):
+        return None
+    workers = min(workers or os.cpu_count() or 1, len(values))
+    if workers < 2 or len(values) < cutoff:
+        return describe_serial(values)
+    return describe_parallel(values, workers)
@@ -0,0 +1,259 @@
+import tkinter as tk
+import threading
+import queue
+from collections import OrderedDict
+import numpy as np
+
+# Number of bars drawn in the histogram view
+HISTOGRAM_BINS = 50
+# Number of entries whose pyramids are kept in memory
+PYRAMID_CACHE_SIZE = 8
+
+
+# Class holding a min/max pyramid of a data point series.
+# Level 0 is the raw series, every following level halves the number of buckets
+# and keeps the minimum and maximum of the two buckets below it. NaN points are
+# skipped (fmin/fmax), so they never hide the valid points sharing a bucket.
+class MinMaxPyramid:
+    def __init__(self, data_points):
+        values = np.asarray(data_points, dtype=np.float64)
+        self.length = len(values)
+        self.mins = [values]
+        self.maxs = [values]
+        while len(self.mins[-1]) > 1:
+            self.mins.append(self._reduce(self.mins[-1], np.fmin))
+            self.maxs.append(self._reduce(self.maxs[-1], np.fmax))
+        self.histogram = np.histogram(values[np.isfinite(values)], bins=HISTOGRAM_BINS) if self.length else None
+
+    # Function to combine neighbouring buckets of a level into the next level
+    @staticmethod
+    def _reduce(level, ufunc):
+        paired = ufunc(level[0:len(level) - 1:2], level[1::2])
+        if len(level) % 2:
+            paired = np.append(paired, level[-1])
+        return paired
+
+    # Function to get the min/max envelope of points [start, end) for a number of pixel columns
+    def query(self, start, end, pixels):
+        start = max(0, int(start))
+        end = min(self.length, int(np.ceil(end)))
+        if end <= start or pixels < 1:
+            return np.empty(0), np.empty(0), np.empty(0)
+
+        # Pick the coarsest level that still has at least one bucket per pixel
+        span = end - start
+        level = 0
+        while level + 1 < len(self.mins) and (span >> (level + 1)) >= pixels:
+            level += 1
+
+        bucket_size = 1 << level
+        first = start >> level
+        last = (end - 1) >> level
+        mins = self.mins[level][first:last + 1]
+        maxs = self.maxs[level][first:last + 1]
+        positions = (np.arange(first, last + 1) << level) + bucket_size / 2.0
+
+        # Reduce the buckets into exactly one min/max pair per pixel column
+        if len(mins) > pixels:
+            columns = ((np.arange(len(mins)) * pixels) // len(mins)).astype(np.intp)
+            boundaries = np.flatnonzero(np.diff(columns, prepend=-1))
+            mins = np.fmin.reduceat(mins, boundaries)
+            maxs = np.fmax.reduceat(maxs, boundaries)
+            positions = positions[boundaries]
+        return positions, mins, maxs
+
+
+# Class caching the pyramids of recently plotted entries
+class PyramidCache:
+    def __init__(self, max_entries=PYRAMID_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.pyramids = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Function to get the pyramid of a data point series, building it if necessary
+    def get(self, data_points):
+        key = id(data_points)
+        with self.lock:
+            cached = self.pyramids.get(key)
+            if cached is not None and cached[0] is data_points:
+                self.pyramids.move_to_end(key)
+                return cached[1]
+
+        pyramid = MinMaxPyramid(data_points)
+        with self.lock:
+            self.pyramids[key] = (data_points, pyramid)
+            self.pyramids.move_to_end(key)
+            while len(self.pyramids) > self.max_entries:
+                self.pyramids.popitem(last=False)
+        return pyramid
+
+
+pyramid_cache = PyramidCache()
+
+
+# Class showing a zoomable plot and a histogram of an entry's data points.
+# Downsampling runs on a worker thread; only drawing happens on the Tk thread.
+class ChartWindow:
+    def __init__(self, title, data_points, summary="", width=800, height=300):
+        self.data_points = data_points
+        self.pyramid = None
+        self.view = (0.0, float(max(len(data_points), 1)))
+        self.generation = 0
+        self.drag_start = None
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+
+        self.window = tk.Toplevel()
+        self.window.title(title)
+
+        self.status_var = tk.StringVar(value="Preparing chart...")
+        tk.Label(self.window, text=summary, justify=tk.LEFT).pack(anchor=tk.W, padx=10, pady=5)
+        tk.Label(self.window, textvariable=self.status_var).pack(anchor=tk.W, padx=10)
+
+        self.series_canvas = tk.Canvas(self.window, width=width, height=height, background="white")
+        self.series_canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.histogram_canvas = tk.Canvas(self.window, width=width, height=height * 2 // 3, background="white")
+        self.histogram_canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.series_canvas.bind("<Configure>", lambda event: self.request_render())
+        self.histogram_canvas.bind("<Configure>", lambda event: self.draw_histogram())
+        self.series_canvas.bind("<MouseWheel>", lambda event: self.zoom(event.x, 0.8 if event.delta > 0 else 1.25))
+        self.series_canvas.bind("<Button-4>", lambda event: self.zoom(event.x, 0.8))
+        self.series_canvas.bind("<Button-5>", lambda event: self.zoom(event.x, 1.25))
+        self.series_canvas.bind("<ButtonPress-1>", self.start_pan)
+        self.series_canvas.bind("<B1-Motion>", self.pan)
+        self.series_canvas.bind("<Double-Button-1>", lambda event: self.reset_view())
+        self.window.bind("<Destroy>", self.close)
+
+        self.worker = threading.Thread(target=self.render_worker, daemon=True)
+        self.worker.start()
+        self.request_render()
+        self.poll_results()
+
+    # Function run by the worker thread: builds the pyramid, then serves render requests
+    def render_worker(self):
+        self.pyramid = pyramid_cache.get(self.data_points)
+        self.results.put(("histogram", None))
+        while True:
+            request = self.requests.get()
+            # Only the most recent view matters, skip any requests queued behind it
+            while not self.requests.empty():
+                request = self.requests.get_nowait()
+            if request is None:
+                return
+            generation, start, end, pixels = request
+            self.results.put(("series", (generation, start, end, self.pyramid.query(start, end, pixels))))
+
+    # Function to ask the worker for a rendering of the current view
+    def request_render(self):
+        self.generation += 1
+        width = max(self.series_canvas.winfo_width(), 1)
+        self.requests.put((self.generation, self.view[0], self.view[1], width))
+
+    # Function to pick up finished renderings on the Tk thread
+    def poll_results(self):
+        try:
+            while True:
+                kind, payload = self.results.get_nowait()
+                if kind == "histogram":
+                    self.draw_histogram()
+                elif payload[0] == self.generation:
+                    self.draw_series(*payload[1:])
+        except queue.Empty:
+            pass
+        if self.window.winfo_exists():
+            self.window.after(30, self.poll_results)
+
+    # Function to draw the downsampled series as a min/max envelope
+    def draw_series(self, start, end, rendering):
+        positions, mins, maxs = rendering
+        canvas = self.series_canvas
+        canvas.delete("all")
+        width = max(canvas.winfo_width(), 1)
+        height = max(canvas.winfo_height(), 1)
+
+        finite = np.isfinite(mins) & np.isfinite(maxs)
+        if not finite.any():
+            self.status_var.set("No data points to plot.")
+            return
+        positions, mins, maxs = positions[finite], mins[finite], maxs[finite]
+
+        low, high = float(mins.min()), float(maxs.max())
+        if high == low:
+            low, high = low - 1.0, high + 1.0
+        margin = 10
+        xs = (positions - start) / (end - start) * width
+        scale = (height - 2 * margin) / (high - low)
+        y_mins = height - margin - (mins - low) * scale
+        y_maxs = height - margin - (maxs - low) * scale
+
+        coordinates = np.empty(len(xs) * 4)
+        coordinates[0::4] = xs
+        coordinates[1::4] = y_mins
+        coordinates[2::4] = xs
+        coordinates[3::4] = y_maxs
+        if len(coordinates) >= 4:
+            canvas.create_line(*coordinates.tolist(), fill="steelblue")
+        canvas.create_text(5, margin, text=f"{high:.4g}", anchor=tk.NW)
+        canvas.create_text(5, height - margin, text=f"{low:.4g}", anchor=tk.SW)
+        self.status_var.set(
+            f"Points {int(start)}-{int(end)} of {len(self.data_points)} "
+            f"(scroll to zoom, drag to pan, double-click to reset)"
+        )
+
+    # Function to draw the histogram of all data points
+    def draw_histogram(self):
+        canvas = self.histogram_canvas
+        canvas.delete("all")
+        if self.pyramid is None or self.pyramid.histogram is None:
+            return
+        counts, edges = self.pyramid.histogram
+        if not counts.any():
+            return
+        width = max(canvas.winfo_width(), 1)
+        height = max(canvas.winfo_height(), 1)
+        margin = 15
+        bar_width = width / len(counts)
+        peak = counts.max()
+        for i, count in enumerate(counts):
+            top = height - margin - (height - 2 * margin) * count / peak
+            canvas.create_rectangle(i * bar_width, top, (i + 1) * bar_width, height - margin, fill="lightsteelblue", outline="steelblue")
+        canvas.create_text(5, height, text=f"{edges[0]:.4g}", anchor=tk.SW)
+        canvas.create_text(width - 5, height, text=f"{edges[-1]:.4g}", anchor=tk.SE)
+
+    # Function to zoom the view around a pixel column
+    def zoom(self, x, factor):
+        start, end = self.view
+        width = max(self.series_canvas.winfo_width(), 1)
+        anchor = start + (end - start) * x / width
+        span = min(max((end - start) * factor, 2.0), float(max(len(self.data_points), 2)))
+        self.set_view(anchor - (anchor - start) * span / (end - start), span)
+
+    # Function to remember where a pan started
+    def start_pan(self, event):
+        self.drag_start = (event.x, self.view)
+
+    # Function to pan the view while dragging
+    def pan(self, event):
+        if self.drag_start is None:
+            return
+        x, (start, end) = self.drag_start
+        width = max(self.series_canvas.winfo_width(), 1)
+        shift = (x - event.x) * (end - start) / width
+        self.set_view(start + shift, end - start)
+
+    # Function to reset the view to the full series
+    def reset_view(self):
+        self.set_view(0.0, float(max(len(self.data_points), 1)))
+
+    # Function to move the view, keeping it inside the series
+    def set_view(self, start, span):
+        length = float(max(len(self.data_points), 1))
+        start = min(max(start, 0.0), max(length - span, 0.0))
+        self.view = (start, min(start + span, length))
+        self.request_render()
+
+    # Function to stop the worker thread when the window is closed
+    def close(self, event):
+        if event.widget is self.window:
+            self.requests.put(None)
@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import base64
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from storage import FileLock, read_current_entries, write_file_atomically
+
+# Thresholds of the outlier tests
+Z_SCORE_THRESHOLD = 3.0
+MAD_THRESHOLD = 3.5
+IQR_FACTOR = 1.5
+OUTLIER_METHODS = ('zscore', 'mad', 'iqr')
+# Number of masks a scanner keeps in memory
+QUALITY_CACHE_SIZE = 256
+
+
+# Class holding the result of a quality scan of one entry.
+# Flagged points are stored as a packed bitmap (one bit per data point).
+class QualityMask:
+    def __init__(self, length, bits, counts, flagged_count):
+        self.length = length
+        self.bits = bits
+        self.counts = counts
+        self.flagged_count = flagged_count
+
+    # Function to build a mask from a boolean array of flagged points
+    @classmethod
+    def from_flags(cls, flagged, counts):
+        return cls(len(flagged), np.packbits(flagged).tobytes(), counts, int(np.count_nonzero(flagged)))
+
+    # Function to build a mask from its JSON form
+    @classmethod
+    def from_json(cls, payload):
+        return cls(payload['length'], base64.b64decode(payload['bits']), payload['counts'], payload['flagged_count'])
+
+    # Function to get the JSON form of the mask
+    def to_json(self):
+        return {'length': self.length, 'bits': base64.b64encode(self.bits).decode('ascii'), 'counts': self.counts, 'flagged_count': self.flagged_count}
+
+    # Function to get the flagged points as a boolean array
+    def flagged(self):
+        return np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8), count=self.length).astype(bool)
+
+    # Function to get the data points that passed the scan
+    def clean(self, data_points):
+        return np.asarray(data_points, dtype=np.float64)[~self.flagged()]
+
+    # Function to describe the flags of the entry
+    def summary(self):
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in self.counts.items() if count)
+        return f"{self.flagged_count} of {self.length} points flagged" + (f" ({reasons})" if reasons else "")
+
+
+# Class flagging invalid, out-of-range and outlying data points.
+# Masks are keyed by the content hash of the entry, so an entry is only scanned
+# again when its contents change. With a data file name, masks are also kept in
+# a sidecar file next to it (one line per mask: content hash, scan settings,
+# JSON mask), so later runs and other processes reuse them without rescanning.
+class QualityScanner:
+    def __init__(self, low=None, high=None, methods=OUTLIER_METHODS, filename=None):
+        self.low = low
+        self.high = high
+        self.methods = methods
+        # Masks of one set of thresholds and methods are never used for another
+        self.settings = hashlib.blake2b(json.dumps([low, high, sorted(methods)]).encode('utf-8'), digest_size=8).hexdigest()
+        # Content hash -> mask, least recently used first
+        self.masks = OrderedDict()
+        self.data_filename = filename
+        self.filename = filename + ".quality" if filename else None
+        # Content hash -> offset of its mask in the sidecar file, and the (device, inode)
+        # of the file they were read from, which changes when another process compacts it
+        self.offsets = {}
+        self.offset = 0
+        self.identity = None
+
+    # Function to compute the flags of a series in one vectorized pass
+    def scan_values(self, data_points):
+        values = np.asarray(data_points, dtype=np.float64)
+        counts = {}
+        invalid = ~np.isfinite(values)
+        counts['non-finite'] = int(np.count_nonzero(invalid))
+        flagged = invalid.copy()
+
+        if self.low is not None or self.high is not None:
+            with np.errstate(invalid='ignore'):
+                out_of_range = np.zeros(len(values), dtype=bool)
+                if self.low is not None:
+                    out_of_range |= values < self.low
+                if self.high is not None:
+                    out_of_range |= values > self.high
+            counts['out-of-range'] = int(np.count_nonzero(out_of_range))
+            flagged |= out_of_range
+
+        finite = values[~invalid]
+        if len(finite) > 2:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                if 'zscore' in self.methods:
+                    std = finite.std()
+                    outliers = np.abs(values - finite.mean()) > Z_SCORE_THRESHOLD * std if std > 0 else np.zeros(len(values), dtype=bool)
+                    counts['z-score'] = int(np.count_nonzero(outliers))
+                    flagged |= outliers
+                if 'mad' in self.methods or 'iqr' in self.methods:
+                    q1, median, q3 = np.percentile(finite, [25, 50, 75])
+                if 'mad' in self.methods:
+                    mad = np.median(np.abs(finite - median))
+                    outliers = 0.6745 * np.abs(values - median) > MAD_THRESHOLD * mad if mad > 0 else np.zeros(len(values), dtype=bool)
+                    counts['MAD'] = int(np.count_nonzero(outliers))
+                    flagged |= outliers
+                if 'iqr' in self.methods:
+                    spread = IQR_FACTOR * (q3 - q1)
+                    outliers = (values < q1 - spread) | (values > q3 + spread)
+                    counts['IQR'] = int(np.count_nonzero(outliers))
+                    flagged |= outliers
+        return QualityMask.from_flags(flagged, counts)
+
+    # Function to get the mask of an entry, scanning its points only if no mask of its contents is known
+    def scan(self, entry):
+        key = entry.content_hash
+        mask = self.masks.get(key)
+        if mask is None:
+            mask = self.load_mask(key)
+            if mask is None or mask.length != len(entry.data_points):
+                mask = self.scan_values(entry.data_points)
+                self.store_mask(key, mask)
+        self.masks[key] = mask
+        self.masks.move_to_end(key)
+        while len(self.masks) > QUALITY_CACHE_SIZE:
+            self.masks.popitem(last=False)
+        return mask
+
+    # Function to get the clean data points of an entry
+    def clean_points(self, entry):
+        return self.scan(entry).clean(entry.data_points)
+
+    # Function to index the masks appended to the sidecar file since the last read
+    def refresh(self):
+        if self.filename is None or not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'rb') as file:
+            status = os.fstat(file.fileno())
+            if (status.st_dev, status.st_ino) != self.identity or status.st_size < self.offset:
+                # The file was replaced, so the offsets read so far point into another file
+                self.offsets = {}
+                self.offset = 0
+                self.identity = (status.st_dev, status.st_ino)
+            file.seek(self.offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                parts = line.split(b' ', 2)
+                if len(parts) == 3 and parts[1].decode('ascii', 'replace') == self.settings:
+                    self.offsets[parts[0].decode('ascii', 'replace')] = self.offset
+                self.offset += len(line)
+
+    # Function to read the stored mask of a content hash from the sidecar file, or None
+    def load_mask(self, key):
+        if self.filename is None:
+            return None
+        # A second try follows if the file was replaced between indexing and reading
+        for _ in range(2):
+            if key not in self.offsets:
+                self.refresh()
+            if key not in self.offsets:
+                return None
+            with open(self.filename, 'rb') as file:
+                file.seek(self.offsets[key])
+                parts = file.readline().split(b' ', 2)
+            if len(parts) == 3 and parts[0].decode('ascii', 'replace') == key and parts[1].decode('ascii', 'replace') == self.settings:
+                try:
+                    return QualityMask.from_json(json.loads(parts[2]))
+                except (ValueError, KeyError):
+                    return None
+            self.identity = None
+            self.refresh()
+        return None
+
+    # Function to append a mask to the sidecar file
+    def store_mask(self, key, mask):
+        if self.filename is None or not key:
+            return
+        with open(self.filename, 'ab') as file:
+            file.write(f"{key} {self.settings} ".encode('ascii') + json.dumps(mask.to_json()).encode('utf-8') + b'\n')
+
+    # Function to rewrite the sidecar file with only the masks of the given content hashes,
+    # under the data file lock so no two processes compact it at once
+    def compact(self, live):
+        if self.filename is None or not os.path.exists(self.filename):
+            return
+        with FileLock(self.data_filename):
+            with open(self.filename, 'rb') as file:
+                lines = {}
+                for line in file:
+                    parts = line.split(b' ', 2)
+                    if line.endswith(b'\n') and len(parts) == 3 and parts[0].decode('ascii', 'replace') in live:
+                        lines[tuple(parts[:2])] = line
+            write_file_atomically(self.filename, b''.join(lines.values()))
+        self.identity = None
+        self.refresh()
+
+    # Function to scan every entry of a manager, dropping masks of removed entries
+    def scan_entries(self, manager):
+        entries = manager.get_entries()
+        masks = [self.scan(entry) for entry in entries]
+        self.compact({entry.content_hash for entry in entries})
+        return masks
+
+    # Function to scan the current entries of a data file (its snapshot with the
+    # change log replayed on top) one at a time, without loading it whole
+    def scan_file(self, filename):
+        for entry in read_current_entries(filename):
+            yield entry, self.scan(entry)
+
+
+# Function to print a quality report of a data file
+def main():
+    filename = sys.argv[1] if len(sys.argv) > 1 else "research_data.avro"
+    if not os.path.exists(filename) and not os.path.exists(filename + ".log"):
+        print(f"{filename} not found.")
+        return
+
+    scanner = QualityScanner(filename=filename)
+    live = set()
+    for i, (entry, mask) in enumerate(scanner.scan_file(filename), start=1):
+        live.add(entry.content_hash)
+        print(f"\nEntry {i}: {entry.experiment_name} ({entry.date}, {entry.researcher})")
+        print(f"Quality: {mask.summary()}")
+        raw = np.asarray(entry.data_points, dtype=np.float64)
+        clean = mask.clean(raw)
+        for label, values in (("Raw", raw), ("Clean", clean)):
+            if len(values):
+                print(f"{label} - Average: {np.mean(values)}, Median: {np.median(values)}, Standard Deviation: {np.std(values)}")
+            else:
+                print(f"{label} - No data points available for analysis.")
+    # Masks of entries that no longer exist are dropped from the sidecar file
+    scanner.compact(live)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import sys
+from array import array
+
+
+# Class holding one research data entry.
+# Using __slots__ avoids a dict per entry, names and dates are interned (on every
+# assignment) so that repeated values share one string, and data points are kept as an array('d').
+class ResearchEntry:
+    __slots__ = ('experiment_name', 'date', 'researcher', 'data_points', 'entry_id', 'version', 'content_hash')
+
+    def __init__(self, experiment_name, date, researcher, data_points, entry_id='', version=0, content_hash=''):
+        self.experiment_name = experiment_name
+        self.date = date
+        self.researcher = researcher
+        self.data_points = data_points if isinstance(data_points, array) and data_points.typecode == 'd' else array('d', data_points)
+        self.entry_id = entry_id
+        self.version = version
+        self.content_hash = content_hash
+
+    # Names and dates are interned however they are set, so updated entries share strings too
+    def __setattr__(self, name, value):
+        if name in ('experiment_name', 'date', 'researcher'):
+            value = sys.intern(value)
+        object.__setattr__(self, name, value)
+
+    # Function to build an entry from a record read from a file or the change log
+    @classmethod
+    def from_dict(cls, record):
+        return cls(
+            record['experiment_name'],
+            record['date'],
+            record['researcher'],
+            record['data_points'],
+            record.get('entry_id', ''),
+            record.get('version', 0),
+            record.get('content_hash', '')
+        )
+
+    # Function to turn the entry into a record for writing
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"ResearchEntry({self.experiment_name!r}, {self.date!r}, {self.researcher!r}, {len(self.data_points)} points)"
@@ -0,0 +1,469 @@
+import sys
+import json
+import math
+import time
+import asyncio
+import hashlib
+import datetime
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PartD import ResearchDataManager, REFRESH_INTERVAL_MS
+from parallel_stats import describe, merge_moments
+from quality import QualityScanner
+from storage import ConflictError, DuplicateEntryError
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Number of GET responses kept by the response cache
+RESPONSE_CACHE_SIZE = 256
+# Largest request body accepted, which bounds a bulk insert
+MAX_BODY_BYTES = 256 << 20
+# Entries returned by a query without a limit
+DEFAULT_LIMIT = 1000
+STATUS_TEXT = {
+    200: 'OK', 201: 'Created', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+
+# Exception turned into an HTTP error response
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Class keeping the most recently used responses, evicting the least recently used one when full
+class ResponseCache:
+    def __init__(self, capacity=RESPONSE_CACHE_SIZE):
+        self.capacity = capacity
+        self.responses = OrderedDict()
+
+    def get(self, key):
+        response = self.responses.get(key)
+        if response is not None:
+            self.responses.move_to_end(key)
+        return response
+
+    def put(self, key, response):
+        self.responses[key] = response
+        self.responses.move_to_end(key)
+        while len(self.responses) > self.capacity:
+            self.responses.popitem(last=False)
+
+    def clear(self):
+        self.responses.clear()
+
+
+# Function to turn a number into JSON, where NaN and infinities have no form, as null
+def json_number(value):
+    return value if math.isfinite(value) else None
+
+
+# Function to turn describe() output into JSON
+def json_stats(stats):
+    return None if stats is None else {name: json_number(value) for name, value in stats.items()}
+
+
+# Function to turn data points into JSON, with the non-finite ones as null
+def json_points(data_points):
+    values = np.asarray(data_points, dtype=np.float64)
+    points = values.tolist()
+    if not np.isfinite(values).all():
+        points = [json_number(point) for point in points]
+    return points
+
+
+# Function to reject the NaN and Infinity tokens Python's json module would otherwise read
+def reject_constant(name):
+    raise ValueError(f"{name} is not valid JSON; send null for a missing or non-finite point.")
+
+
+# Function to check one entry of a bulk insert, returning an error message or None.
+# A null data point stands for a missing or non-finite reading and is stored as NaN,
+# which the quality scan flags; it is how such points are returned, too.
+def validate_record(record):
+    if not isinstance(record, dict):
+        return "Entries must be JSON objects."
+    for field in ('experiment_name', 'date', 'researcher'):
+        if not isinstance(record.get(field), str) or not record[field].strip():
+            return f"{field} must be a non-empty string."
+    try:
+        datetime.datetime.strptime(record['date'], "%Y-%m-%d")
+    except ValueError:
+        return "Date must be in the format YYYY-MM-DD."
+    points = record.get('data_points')
+    if not isinstance(points, list) or not all(point is None or isinstance(point, (int, float)) and not isinstance(point, bool) for point in points):
+        return "data_points must be a list of numbers or nulls."
+    return None
+
+
+# Function to describe an entry as JSON, with its data points if asked for
+def entry_json(entry, with_points=False):
+    result = {
+        'entry_id': entry.entry_id,
+        'experiment_name': entry.experiment_name,
+        'date': entry.date,
+        'researcher': entry.researcher,
+        'version': entry.version,
+        'content_hash': entry.content_hash,
+        'count': len(entry.data_points),
+    }
+    if with_points:
+        result['data_points'] = json_points(entry.data_points)
+    return result
+
+
+# Class serving one loaded dataset to many clients over HTTP/JSON.
+# Every call into the manager runs on a single worker thread, so all
+# connections share the same loaded, indexed entries without locking, while the
+# event loop keeps accepting and answering requests. GET responses are cached
+# per data generation and carry an ETag, so unchanged results cost clients a 304.
+class DataService:
+    def __init__(self, manager=None):
+        self.manager = manager if manager is not None else ResearchDataManager()
+        self.quality = QualityScanner(filename=self.manager.filename)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.cache = ResponseCache()
+        # Bumped whenever the entries change, which retires every cached response
+        self.generation = 0
+        self.last_refresh = time.monotonic()
+        # id of data points -> (data points, count, mean, sum of squared deviations)
+        self.moments = {}
+        self.build_index()
+
+    # Function to index the entries by id, experiment name and researcher
+    def build_index(self):
+        self.by_id = {}
+        self.by_experiment = {}
+        self.by_researcher = {}
+        for entry in self.manager.get_entries():
+            self.by_id[entry.entry_id] = entry
+            self.by_experiment.setdefault(entry.experiment_name, []).append(entry)
+            self.by_researcher.setdefault(entry.researcher, []).append(entry)
+        live = {id(entry.data_points) for entry in self.manager.get_entries()}
+        for key in [key for key in self.moments if key not in live]:
+            del self.moments[key]
+
+    # Function to note that the entries changed
+    def changed(self):
+        self.generation += 1
+        self.cache.clear()
+        self.build_index()
+
+    # Function to pick up changes saved by other clients of the data file
+    def refresh(self):
+        if time.monotonic() - self.last_refresh < REFRESH_INTERVAL_MS / 1000:
+            return
+        self.last_refresh = time.monotonic()
+        if self.manager.refresh():
+            self.changed()
+
+    # Function to get the count, mean and sum of squared deviations of an entry's points
+    def entry_moments(self, data_points):
+        key = id(data_points)
+        cached = self.moments.get(key)
+        if cached is None or cached[0] is not data_points:
+            values = np.asarray(data_points, dtype=np.float64)
+            mean = float(values.mean()) if len(values) else 0.0
+            cached = (data_points, len(values), mean, float(np.square(values - mean).sum()))
+            self.moments[key] = cached
+        return cached[1:]
+
+    # Function to get the entries matching the filters of a query
+    def select(self, query):
+        if 'as_of' in query:
+            try:
+                when = float(query['as_of'])
+            except ValueError:
+                try:
+                    when = datetime.datetime.fromisoformat(query['as_of'])
+                except ValueError:
+                    raise HTTPError(400, "as_of must be a Unix timestamp or an ISO date and time.")
+            entries = self.manager.get_entries_as_of(when)
+            if 'experiment' in query:
+                entries = [entry for entry in entries if entry.experiment_name == query['experiment']]
+            if 'researcher' in query:
+                entries = [entry for entry in entries if entry.researcher == query['researcher']]
+        elif 'experiment' in query:
+            entries = self.by_experiment.get(query['experiment'], [])
+            if 'researcher' in query:
+                entries = [entry for entry in entries if entry.researcher == query['researcher']]
+        elif 'researcher' in query:
+            entries = self.by_researcher.get(query['researcher'], [])
+        else:
+            entries = self.manager.get_entries()
+        if 'date_from' in query:
+            entries = [entry for entry in entries if entry.date >= query['date_from']]
+        if 'date_to' in query:
+            entries = [entry for entry in entries if entry.date <= query['date_to']]
+        return entries
+
+    # GET /entries: entries matching experiment, researcher, date_from, date_to
+    # and as_of, paged by offset and limit; points=1 includes the data points
+    def get_entries(self, query):
+        entries = self.select(query)
+        try:
+            offset = int(query.get('offset', 0))
+            limit = int(query.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            raise HTTPError(400, "offset and limit must be integers.")
+        with_points = query.get('points') == '1'
+        return 200, {'total': len(entries), 'entries': [entry_json(entry, with_points) for entry in entries[offset:offset + limit]]}
+
+    # GET /entries/<id>: one entry with its data points
+    def get_entry(self, entry_id):
+        entry = self.by_id.get(entry_id)
+        if entry is None:
+            raise HTTPError(404, f"No entry with id {entry_id}.")
+        return entry
+
+    # GET /entries/<id>/stats: raw and clean statistics of one entry
+    def get_entry_stats(self, entry_id):
+        entry = self.get_entry(entry_id)
+        mask = self.quality.scan(entry)
+        return 200, {
+            'entry_id': entry_id,
+            'raw': json_stats(describe(entry.data_points)),
+            'clean': json_stats(describe(mask.clean(entry.data_points))),
+            'quality': mask.summary(),
+        }
+
+    # GET /stats: pooled count, mean and standard deviation of the entries matching a query
+    def get_stats(self, query):
+        entries = self.select(query)
+        count, mean, m2 = merge_moments(self.entry_moments(entry.data_points) for entry in entries if len(entry.data_points))
+        return 200, {
+            'entries': len(entries),
+            'count': count,
+            'mean': json_number(mean) if count else None,
+            'std': json_number((m2 / count) ** 0.5) if count else None,
+        }
+
+    # POST /entries: add a list of entries (or {"entries": [...]}) and save them.
+    # Nothing is added if any entry is invalid; duplicates of existing entries are skipped.
+    def post_entries(self, body):
+        try:
+            records = json.loads(body, parse_constant=reject_constant)
+        except ValueError:
+            raise HTTPError(400, "The request body must be JSON.")
+        if isinstance(records, dict):
+            records = records.get('entries')
+        if not isinstance(records, list):
+            raise HTTPError(400, "Send a list of entries.")
+        errors = [{'index': i, 'error': error} for i, error in enumerate(map(validate_record, records)) if error]
+        if errors:
+            return 400, {'error': "No entries were added.", 'errors': errors}
+
+        added, duplicates = [], []
+        # Entry id -> (position in the request, content hash) of every added entry
+        requested = {}
+        for i, record in enumerate(records):
+            try:
+                data_points = [math.nan if point is None else point for point in record['data_points']]
+                self.manager.add_entry(record['experiment_name'].strip(), record['date'], record['researcher'].strip(), data_points)
+                entry = self.manager.get_entries()[-1]
+                added.append(entry.entry_id)
+                requested[entry.entry_id] = (i, entry.content_hash)
+            except DuplicateEntryError as error:
+                duplicates.append({'index': i, 'entry_id': error.entry_id})
+            except ValueError as error:
+                # Points the dataset's encoding cannot store
+                errors.append({'index': i, 'error': str(error)})
+        if errors:
+            self.manager.discard_new_entries(added)
+            return 400, {'error': "No entries were added.", 'errors': errors}
+        if added:
+            try:
+                dropped = self.manager.save_entries_to_file()
+            except ConflictError as error:
+                self.manager.discard_new_entries(added)
+                raise HTTPError(409, str(error))
+            except ValueError as error:
+                # Another user switched to an encoding some of the points do not fit
+                self.manager.discard_new_entries(added)
+                return 400, {'error': "No entries were added.", 'errors': [{'error': str(error)}]}
+            # New entries another client saved first are reported as duplicates
+            duplicates += [{'index': requested[entry_id][0], 'entry_id': self.manager.find_duplicate(requested[entry_id][1])} for entry_id in dropped]
+            added = [entry_id for entry_id in added if entry_id not in dropped]
+            self.last_refresh = time.monotonic()
+        self.changed()
+        return 201 if added else 200, {'added': added, 'duplicates': duplicates}
+
+    # Function to route a request, returning its status, ETag and body
+    def route(self, method, path, query, body):
+        parts = [part for part in path.split('/') if part]
+        if parts == ['entries'] and method == 'POST':
+            return self.post_entries(body)
+        if method != 'GET':
+            raise HTTPError(405, f"{method} is not supported on {path}.")
+        if parts == ['entries']:
+            return self.get_entries(query)
+        if len(parts) == 2 and parts[0] == 'entries':
+            return 200, entry_json(self.get_entry(parts[1]), with_points=True)
+        if len(parts) == 3 and parts[0] == 'entries' and parts[2] == 'stats':
+            return self.get_entry_stats(parts[1])
+        if parts == ['stats']:
+            return self.get_stats(query)
+        raise HTTPError(404, f"Nothing at {path}.")
+
+    # Function to answer a request on the worker thread, returning its status, ETag and body
+    def handle(self, method, target, headers, body):
+        url = urllib.parse.urlsplit(target)
+        query = {name: values[-1] for name, values in urllib.parse.parse_qs(url.query).items()}
+        try:
+            self.refresh()
+            key = (self.generation, target)
+            cached = self.cache.get(key) if method == 'GET' else None
+            if cached is None:
+                status, payload = self.route(method, url.path, query, body)
+                # Non-finite numbers are mapped to null above; anything missed fails here rather than sending invalid JSON
+                data = json.dumps(payload, allow_nan=False).encode('utf-8')
+                cached = (status, '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"', data)
+                if method == 'GET' and status == 200:
+                    self.cache.put(key, cached)
+        except HTTPError as error:
+            return error.status, None, json.dumps({'error': str(error)}).encode('utf-8')
+        except Exception as error:
+            return 500, None, json.dumps({'error': f"{type(error).__name__}: {error}"}).encode('utf-8')
+        status, etag, data = cached
+        if method == 'GET' and etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+            return 304, etag, b''
+        return status, etag, data
+
+    # Function to serve the HTTP/1.1 requests of one connection, keeping it open between requests
+    async def serve_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                if length < 0:
+                    # Without a valid length the body cannot be told from the next request
+                    status, etag, data = 400, None, json.dumps({'error': "Invalid Content-Length."}).encode('utf-8')
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, etag, data = 413, None, json.dumps({'error': "The request body is too large."}).encode('utf-8')
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, etag, data = await loop.run_in_executor(self.executor, self.handle, method.upper(), target, headers, body)
+
+                head = [
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(data)}",
+                    "Cache-Control: no-cache",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                if etag:
+                    head.append(f"ETag: {etag}")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # Function to serve requests until cancelled
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+# Class for scripts and notebooks talking to a running service.
+# Responses are remembered with their ETag, so repeated queries of unchanged data
+# are answered by a 304 without transferring the body again.
+class ServiceClient:
+    def __init__(self, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"):
+        self.url = url.rstrip('/')
+        self.responses = ResponseCache()
+
+    # Function to send a request and decode its JSON answer
+    def request(self, path, query=None, payload=None):
+        url = self.url + path + ('?' + urllib.parse.urlencode(query) if query else '')
+        request = urllib.request.Request(url)
+        if payload is not None:
+            request.data = json.dumps(payload).encode('utf-8')
+            request.add_header('Content-Type', 'application/json')
+        else:
+            cached = self.responses.get(url)
+            if cached is not None:
+                request.add_header('If-None-Match', cached[0])
+        try:
+            with urllib.request.urlopen(request) as response:
+                data = response.read()
+                if payload is None and response.headers.get('ETag'):
+                    self.responses.put(url, (response.headers['ETag'], data))
+        except urllib.error.HTTPError as error:
+            if error.code != 304:
+                raise
+            data = self.responses.get(url)[1]
+        return json.loads(data)
+
+    # Function to query entries: experiment, researcher, date_from, date_to, as_of, offset, limit and points
+    def query(self, **filters):
+        if 'points' in filters:
+            filters['points'] = '1' if filters['points'] else '0'
+        return self.request('/entries', filters)
+
+    def entry(self, entry_id):
+        return self.request(f'/entries/{urllib.parse.quote(entry_id)}')
+
+    def entry_stats(self, entry_id):
+        return self.request(f'/entries/{urllib.parse.quote(entry_id)}/stats')
+
+    def stats(self, **filters):
+        return self.request('/stats', filters)
+
+    # Function to add entries given as dicts with experiment_name, date, researcher and
+    # data_points; non-finite points are sent as null
+    def insert(self, entries):
+        entries = [dict(entry, data_points=[None if point is None or not math.isfinite(point) else point for point in entry['data_points']]) for entry in entries]
+        try:
+            return self.request('/entries', payload=entries)
+        except urllib.error.HTTPError as error:
+            if error.code == 400:
+                return json.loads(error.read())
+            raise
+
+
+# Function to run the service on the data file of the current directory
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    host = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_HOST
+    service = DataService()
+    print(f"Serving {service.manager.filename} ({len(service.manager.get_entries())} entries) on http://{host}:{port}")
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+import io
+import os
+import sys
+import json
+import uuid
+import base64
+import hashlib
+from array import array
+import numpy as np
+import avro.schema
+import avro.io
+import avro.datafile
+from research_entry import ResearchEntry
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Schema of data files written before entries had ids and versions (header-less Avro)
+LEGACY_SCHEMA = avro.schema.Parse(json.dumps({
+    "type": "record",
+    "name": "ResearchData",
+    "fields": [
+        {"name": "experiment_name", "type": "string"},
+        {"name": "date", "type": "string"},
+        {"name": "researcher", "type": "string"},
+        {"name": "data_points", "type": {"type": "array", "items": "float"}}
+    ]
+}))
+CONTAINER_MAGIC = b'Obj\x01'
+# Container metadata key holding the numeric encoding of a dataset
+ENCODING_KEY = 'rdms.encoding'
+# Container metadata key telling whether identical point arrays are stored once
+DEDUPLICATE_KEY = 'rdms.deduplicate'
+# Little-endian storage type of each numeric encoding
+ENCODING_TYPES = {'float32': '<f4', 'float64': '<f8', 'int16': '<i2', 'int32': '<i4'}
+# Data sets without an encoding keep full double precision
+DEFAULT_ENCODING = {'type': 'float64'}
+# Largest difference, as a fraction of the scale, between a point and the integer
+# step storing it; anything further off would be rounded and is rejected
+ROUND_TRIP_TOLERANCE = 1e-6
+# Number of change records after which a save writes a new snapshot and starts a new change log
+LOG_ROTATE_RECORDS = 1000
+# Point changes touching more than this fraction of the points are stored whole
+POINT_DIFF_RATIO = 0.5
+TEXT_FIELDS = ('experiment_name', 'date', 'researcher')
+
+
+# Exception raised when an entry would duplicate an existing one
+class DuplicateEntryError(ValueError):
+    def __init__(self, entry_id):
+        super().__init__("An identical entry already exists.")
+        self.entry_id = entry_id
+
+
+# Exception raised when a save would overwrite entries another client changed
+class ConflictError(Exception):
+    def __init__(self, entry_ids):
+        super().__init__(f"{len(entry_ids)} entries were changed by another user.")
+        self.entry_ids = entry_ids
+
+
+# Class holding an advisory lock on a data file.
+# Readers take a shared lock, writers an exclusive one. The lock lives in a
+# separate file so the data file itself can be replaced while locked.
+class FileLock:
+    def __init__(self, filename, exclusive=True):
+        self.filename = filename + ".lock"
+        self.exclusive = exclusive
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.filename, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        else:
+            # msvcrt only offers exclusive locks
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+# Class appending committed changes to a log next to the data file.
+# The first line names the log generation; every other line is one JSON change
+# record, so clients can pick up only what changed since their last read.
+# Records are synced to disk before a save returns, which makes the log a
+# write-ahead journal: the snapshot is only rewritten when the log is rotated,
+# and loading replays the log on top of it. An edit of an existing entry is
+# logged as a delta against the version it is based on (changed fields and
+# point patches), so a small edit of a large entry only syncs a small record.
+class ChangeLog:
+    def __init__(self, filename):
+        self.filename = filename + ".log"
+
+    # Function to get the generation of the log, or None if there is no log
+    def generation(self):
+        if not os.path.exists(self.filename):
+            return None
+        with open(self.filename, 'rb') as file:
+            header = file.readline()
+        return json.loads(header)['generation'] if header.endswith(b'\n') else None
+
+    # Function to read the records after an offset of a generation.
+    # Returns the current generation, the records and the offset to continue from;
+    # a changed generation means the reader has to start over from the snapshot.
+    def read(self, generation=None, offset=0):
+        if not os.path.exists(self.filename):
+            return None, [], 0
+        with open(self.filename, 'rb') as file:
+            header = file.readline()
+            if not header.endswith(b'\n'):
+                return None, [], 0
+            current = json.loads(header)['generation']
+            if current != generation or offset < file.tell():
+                offset = file.tell()
+            file.seek(offset)
+            records = []
+            for line in file:
+                # A torn last line is what a crash in the middle of an append leaves behind
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if 'entry' in record:
+                    record['entry'] = entry_from_json(record['entry'])
+                records.append(record)
+                offset += len(line)
+        return current, records, offset
+
+    # Function to append change records {entry_id, version, entry, delta} and sync them
+    # to disk, returning the offset after them. Records with a delta are logged without the entry.
+    def append(self, records):
+        if self.generation() is None:
+            self.rotate()
+        lines = []
+        for record in records:
+            if record.get('delta') is not None:
+                lines.append({'entry_id': record['entry_id'], 'version': record['version'], 'delta': record['delta']})
+            else:
+                lines.append({'entry_id': record['entry_id'], 'version': record['version'], 'entry': entry_to_json(record['entry'])})
+        data = b''.join(json.dumps(line).encode('utf-8') + b'\n' for line in lines)
+        with open(self.filename, 'r+b') as file:
+            file.seek(complete_length(file))
+            file.truncate()
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+            return file.tell()
+
+    # Function to start a new, empty generation of the log
+    def rotate(self):
+        generation = uuid.uuid4().hex
+        write_file_atomically(self.filename, json.dumps({'generation': generation}).encode('utf-8') + b'\n')
+        return generation
+
+
+# Function to get the length of a file up to its last complete line
+def complete_length(file):
+    end = file.seek(0, os.SEEK_END)
+    while end > 0:
+        start = max(end - 4096, 0)
+        file.seek(start)
+        newline = file.read(end - start).rfind(b'\n')
+        if newline >= 0:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+# Function to replace a file atomically: the data is written to a temporary file,
+# synced to disk and renamed over the target, so readers and crashes only ever
+# see the old or the new contents
+def write_file_atomically(filename, data):
+    temporary = f"{filename}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, filename)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+    # Make the rename itself durable
+    if os.name == 'posix':
+        directory = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+# Function to check a numeric encoding, filling in the defaults of scale and offset
+def check_encoding(encoding):
+    if encoding.get('type') not in ENCODING_TYPES:
+        raise ValueError(f"Unknown data point encoding: {encoding.get('type')}.")
+    if encoding['type'].startswith('int'):
+        encoding = {'type': encoding['type'], 'scale': float(encoding.get('scale', 1.0)), 'offset': float(encoding.get('offset', 0.0))}
+        if not encoding['scale'] > 0:
+            raise ValueError("The scale of an integer encoding must be positive.")
+    return encoding
+
+
+# Function to pack data points into bytes with a numeric encoding.
+# Raises ValueError if a point cannot be stored: outside the range of the encoding,
+# between two steps of an integer encoding, or too large for float32. Points are
+# never silently rounded to something else.
+def encode_points(data_points, encoding):
+    values = np.asarray(data_points, dtype=np.float64)
+    dtype = np.dtype(ENCODING_TYPES[encoding['type']])
+    if dtype.kind == 'i':
+        scale, offset = encoding['scale'], encoding['offset']
+        with np.errstate(invalid='ignore', over='ignore'):
+            scaled = np.round((values - offset) / scale)
+        limits = np.iinfo(dtype)
+        if not (np.isfinite(scaled).all() and (scaled >= limits.min).all() and (scaled <= limits.max).all()):
+            raise ValueError(
+                f"Data points must be finite and between {limits.min * scale + offset:g} "
+                f"and {limits.max * scale + offset:g} for {encoding['type']} storage."
+            )
+        inexact = np.flatnonzero(np.abs(scaled * scale + offset - values) > ROUND_TRIP_TOLERANCE * scale)
+        if len(inexact):
+            raise ValueError(
+                f"Data point {values[inexact[0]]:g} cannot be stored exactly as {encoding['type']} "
+                f"with scale {scale:g} and offset {offset:g}."
+            )
+        values = scaled
+    elif dtype.kind == 'f' and dtype.itemsize < 8:
+        with np.errstate(over='ignore'):
+            cast = values.astype(dtype)
+        overflow = np.flatnonzero(np.isinf(cast) & np.isfinite(values))
+        if len(overflow):
+            raise ValueError(f"Data point {values[overflow[0]]:g} is too large for {encoding['type']} storage.")
+        return cast.tobytes()
+    return values.astype(dtype).tobytes()
+
+
+# Function to unpack data points stored with a numeric encoding into an array('d')
+def decode_points(raw, encoding):
+    if encoding['type'] == 'float64':
+        points = array('d')
+        points.frombytes(raw)
+        if sys.byteorder == 'big':
+            points.byteswap()
+        return points
+    values = np.frombuffer(raw, dtype=ENCODING_TYPES[encoding['type']])
+    if encoding['type'].startswith('int'):
+        values = values * encoding['scale'] + encoding['offset']
+    return array('d', values.astype(np.float64).tobytes())
+
+
+# Function to round data points to what an encoding can store
+def quantize_points(data_points, encoding):
+    return decode_points(encode_points(data_points, encoding), encoding)
+
+
+# Function to turn an entry into a JSON-friendly change record payload.
+# Points are kept as base64 doubles so the log never loses precision.
+def entry_to_json(entry):
+    if entry is None:
+        return None
+    return dict(entry.to_dict(), data_points=base64.b64encode(encode_points(entry.data_points, DEFAULT_ENCODING)).decode('ascii'))
+
+
+# Function to turn a change record payload back into an entry
+def entry_from_json(payload):
+    if payload is None:
+        return None
+    if isinstance(payload['data_points'], list):
+        # Records written before points were packed
+        entry = ResearchEntry.from_dict(payload)
+    else:
+        entry = ResearchEntry.from_dict(dict(payload, data_points=decode_points(base64.b64decode(payload['data_points']), DEFAULT_ENCODING)))
+    if not entry.content_hash:
+        entry.content_hash = content_hash(entry)
+    return entry
+
+
+# Function to pack an array of values into base64 text
+def pack_values(values, dtype):
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+
+
+# Function to unpack base64 text into an array of values
+def unpack_values(text, dtype):
+    return np.frombuffer(base64.b64decode(text), dtype=dtype)
+
+
+# Function to describe how the points of an entry changed: only the changed and
+# appended points with their positions, or all points if most of them changed.
+# Returns None if the points did not change.
+def diff_points(old_points, new_points):
+    old = np.asarray(old_points, dtype=np.float64)
+    new = np.asarray(new_points, dtype=np.float64)
+    common = min(len(old), len(new))
+    # Bitwise comparison, so NaN points compare equal to themselves
+    changed = np.flatnonzero(old[:common].view(np.int64) != new[:common].view(np.int64))
+    appended = len(new) - common
+    if not len(changed) and len(old) == len(new):
+        return None
+    if len(changed) + appended > POINT_DIFF_RATIO * len(new):
+        return {'values': pack_values(new, '<f8')}
+    index_type = '<u4' if len(new) <= 1 << 32 else '<u8'
+    return {
+        'length': len(new),
+        'index_type': index_type,
+        'indices': pack_values(changed, index_type),
+        'values': pack_values(np.concatenate([new[changed], new[common:]]), '<f8'),
+    }
+
+
+# Function to apply a point change described by diff_points to an array of points
+def patch_points(points, diff):
+    values = unpack_values(diff['values'], '<f8')
+    if 'indices' not in diff:
+        return values.copy()
+    indices = unpack_values(diff['indices'], diff['index_type'])
+    patched = np.empty(diff['length'], dtype=np.float64)
+    common = min(len(points), diff['length'])
+    patched[:common] = points[:common]
+    patched[indices] = values[:len(indices)]
+    patched[common:] = values[len(indices):]
+    return patched
+
+
+# Function to describe an edit of an entry as a delta against the version it is based on.
+# Returns None if most points changed, in which case the whole entry is cheaper to store.
+def entry_delta(original, entry):
+    points = diff_points(original.data_points, entry.data_points)
+    if points is not None and 'indices' not in points:
+        return None
+    delta = {
+        'base': original.version,
+        'fields': {field: getattr(entry, field) for field in TEXT_FIELDS if getattr(entry, field) != getattr(original, field)},
+        'content_hash': entry.content_hash,
+    }
+    if points is not None:
+        delta['points'] = points
+    return delta
+
+
+# Function to build the version of an entry described by a delta against it.
+# Unchanged points keep sharing the array of the base entry.
+def apply_delta(entry, delta, version):
+    data_points = entry.data_points
+    if 'points' in delta:
+        data_points = quantize_points(patch_points(np.asarray(data_points, dtype=np.float64), delta['points']), DEFAULT_ENCODING)
+    fields = {field: delta['fields'].get(field, getattr(entry, field)) for field in TEXT_FIELDS}
+    return ResearchEntry(fields['experiment_name'], fields['date'], fields['researcher'], data_points, entry.entry_id, version, delta['content_hash'])
+
+
+# Function to apply the change records of one entry, oldest first, to the entry
+# (None if it does not exist yet). Returns the resulting entry, or None if deleted.
+def replay_entry(entry, records):
+    for record in records:
+        if entry is not None and entry.version >= record['version']:
+            continue
+        if 'delta' in record:
+            # The log holds every version after the snapshot, so the base is always there
+            if entry is not None and entry.version == record['delta']['base']:
+                entry = apply_delta(entry, record['delta'], record['version'])
+        else:
+            entry = record['entry']
+    return entry
+
+
+# Function to hash the data points of an entry alone
+def points_hash(data_points):
+    return hashlib.blake2b(encode_points(data_points, DEFAULT_ENCODING), digest_size=16).hexdigest()
+
+
+# Function to hash the contents of an entry (metadata plus packed points).
+# Entries with the same hash are duplicates of each other.
+def content_hash(entry):
+    digest = hashlib.blake2b(digest_size=16)
+    for value in (entry.experiment_name, entry.date, entry.researcher):
+        value = value.encode('utf-8')
+        digest.update(len(value).to_bytes(4, 'little'))
+        digest.update(value)
+    digest.update(encode_points(entry.data_points, DEFAULT_ENCODING))
+    return digest.hexdigest()
+
+
+# Function to read the dataset settings of a data file: the numeric encoding
+# and whether identical point arrays are stored once
+def read_settings(filename):
+    if not os.path.exists(filename):
+        return DEFAULT_ENCODING, False
+    with open(filename, 'rb') as file:
+        if file.read(len(CONTAINER_MAGIC)) != CONTAINER_MAGIC:
+            return DEFAULT_ENCODING, False
+        file.seek(0)
+        reader = avro.datafile.DataFileReader(file, avro.io.DatumReader())
+        encoding = reader.meta.get(ENCODING_KEY)
+        deduplicate = reader.meta.get(DEDUPLICATE_KEY) == b'1'
+    return (check_encoding(json.loads(encoding)) if encoding else DEFAULT_ENCODING), deduplicate
+
+
+# Function to read the entries of a data file one at a time.
+# Data points come back as array('d') whatever way the file stores them, and
+# entries stored by reference share one array.
+def read_entries(filename):
+    with open(filename, 'rb') as file:
+        yield from read_file_entries(file)
+
+
+# Function to read the entries of an open data file one at a time, see read_entries
+def read_file_entries(file):
+    if file.read(len(CONTAINER_MAGIC)) == CONTAINER_MAGIC:
+        file.seek(0)
+        reader = avro.datafile.DataFileReader(file, avro.io.DatumReader())
+        encoding = reader.meta.get(ENCODING_KEY)
+        encoding = check_encoding(json.loads(encoding)) if encoding else DEFAULT_ENCODING
+        shared_points = {}
+        for record in reader:
+            points_ref = record.get('points_ref', '')
+            if points_ref and points_ref in shared_points:
+                record['data_points'] = shared_points[points_ref]
+            elif isinstance(record['data_points'], bytes):
+                record['data_points'] = decode_points(record['data_points'], encoding)
+            # Containers written before points were packed hold a float array,
+            # which ResearchEntry turns into an array('d')
+            entry = ResearchEntry.from_dict(record)
+            if points_ref:
+                shared_points[points_ref] = entry.data_points
+            if not entry.content_hash:
+                entry.content_hash = content_hash(entry)
+            yield entry
+        return
+
+    # Header-less file from before ids existed: give entries stable ids by position
+    file.seek(0)
+    size = os.fstat(file.fileno()).st_size
+    decoder = avro.io.BinaryDecoder(file)
+    reader = avro.io.DatumReader(LEGACY_SCHEMA)
+    position = 0
+    while file.tell() < size:
+        entry = ResearchEntry.from_dict(reader.read(decoder))
+        entry.entry_id = f"legacy-{position}"
+        entry.content_hash = content_hash(entry)
+        position += 1
+        yield entry
+
+
+# Function to write entries to a data file as an Avro container.
+# With deduplicate, points identical to an earlier entry's are written as a
+# reference to that entry's points instead of a second copy.
+def write_entries(filename, schema, entries, encoding=DEFAULT_ENCODING, deduplicate=False):
+    buffer = io.BytesIO()
+    writer = avro.datafile.DataFileWriter(buffer, avro.io.DatumWriter(), schema)
+    writer.meta[ENCODING_KEY] = json.dumps(encoding).encode('utf-8')
+    writer.meta[DEDUPLICATE_KEY] = b'1' if deduplicate else b'0'
+    written_points = set()
+    for entry in entries:
+        packed = encode_points(entry.data_points, encoding)
+        points_ref = ''
+        if deduplicate:
+            points_ref = hashlib.blake2b(packed, digest_size=16).hexdigest()
+            if points_ref in written_points:
+                packed = b''
+            written_points.add(points_ref)
+        writer.append(dict(entry.to_dict(), data_points=packed, points_ref=points_ref))
+    writer.flush()
+    # Everything is encoded before the file is touched, so a bad entry cannot damage it
+    write_file_atomically(filename, buffer.getvalue())
+
+
+# Function to read the current entries of a data file one at a time: the snapshot
+# with the change log replayed on top. The shared lock is only held while the log
+# is read and the snapshot opened, so saves are not blocked while the caller works
+# through the entries; a checkpoint replaces the snapshot by rename, which leaves
+# the open file holding the snapshot that matches the log records read.
+def read_current_entries(filename):
+    with FileLock(filename, exclusive=False):
+        _, records, _ = ChangeLog(filename).read()
+        file = open(filename, 'rb') if os.path.exists(filename) else None
+    changes = {}
+    for record in records:
+        changes.setdefault(record['entry_id'], []).append(record)
+    if file is not None:
+        with file:
+            for entry in read_file_entries(file):
+                entry = replay_entry(entry, changes.pop(entry.entry_id, []))
+                if entry is not None:
+                    yield entry
+    # Entries added since the snapshot was written
+    for entry_records in changes.values():
+        entry = replay_entry(None, entry_records)
+        if entry is not None:
+            yield entry
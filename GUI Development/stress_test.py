@@ -0,0 +1,84 @@
+import os
+import sys
+import random
+import shutil
+import tempfile
+import multiprocessing
+from collections import Counter
+from PartD import ResearchDataManager
+from storage import ConflictError
+
+DEFAULT_WRITERS = 8
+DEFAULT_ENTRIES = 30
+# Every this many adds, a writer also updates a random entry
+UPDATE_EVERY = 5
+
+
+# Function to save, keeping the other user's version of conflicting entries.
+# Returns False if the edit was dropped because of a conflict.
+def save(manager):
+    try:
+        manager.save_entries_to_file()
+        return True
+    except ConflictError:
+        manager.discard_conflicts()
+        manager.save_entries_to_file()
+        return False
+
+
+# Function run by each writer process: add entries one save at a time and now and
+# then append a unique marker point to a random entry, reporting every marker saved
+def writer(directory, number, count, results):
+    os.chdir(directory)
+    random.seed(number)
+    manager = ResearchDataManager()
+    markers = []
+    for i in range(count):
+        manager.add_entry(f"Writer {number}", "2024-01-01", f"Researcher {number}", [float(number), float(i)])
+        save(manager)
+        if i % UPDATE_EVERY == 0:
+            manager.refresh()
+            index = random.randrange(len(manager.get_entries()))
+            entry = manager.get_entries()[index]
+            marker = 1000.0 * (number + 1) + i
+            manager.update_entry(index, entry.experiment_name, entry.date, entry.researcher, list(entry.data_points) + [marker])
+            if save(manager):
+                markers.append(marker)
+    results.put((number, markers))
+
+
+# Function to run many writer processes against one data file and check that no write was lost
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_WRITERS
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ENTRIES
+    directory = tempfile.mkdtemp(prefix="rdms-stress-")
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "research_data_schema.avsc"), directory)
+    try:
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=writer, args=(directory, number, count, results)) for number in range(writers)]
+        for process in processes:
+            process.start()
+        markers = dict(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        failed = [process.exitcode for process in processes if process.exitcode != 0]
+        assert not failed, f"{len(failed)} writer processes failed."
+
+        os.chdir(directory)
+        entries = ResearchDataManager().get_entries()
+        added = Counter(entry.experiment_name for entry in entries)
+        stored = {point for entry in entries for point in entry.data_points}
+        lost_adds = {number: count - added[f"Writer {number}"] for number in range(writers) if added[f"Writer {number}"] != count}
+        lost_updates = [marker for saved in markers.values() for marker in saved if marker not in stored]
+        print(f"{writers} writers, {len(entries)} of {writers * count} entries stored, "
+              f"{sum(len(saved) for saved in markers.values())} updates saved, {len(lost_updates)} lost.")
+        assert not lost_adds, f"Lost adds per writer: {lost_adds}"
+        assert not lost_updates, f"Lost updates: {lost_updates}"
+        print("No lost writes.")
+    finally:
+        os.chdir(os.path.dirname(directory))
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,30 @@ import avro.schema
 import avro.io
 import io
 import datetime
+import sys
+from array import array
+
+# Class for one entry, converted to and from the records of the Avro schema
+class ResearchEntry:
+    __slots__ = ('experiment_name', 'date', 'researcher', 'data_points')
+
+    def __init__(self, experiment_name, date, researcher, data_points):
+        self.experiment_name = experiment_name
+        self.date = date
+        self.researcher = researcher
+        self.data_points = array('d', data_points)
+
+    # Repeated names read from the file share one string
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, sys.intern(value) if isinstance(value, str) else value)
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(**record)
+
+    # The Avro writer takes the points as a list
+    def to_dict(self):
+        return dict({name: getattr(self, name) for name in self.__slots__}, data_points=list(self.data_points))
 
 # Class to manage research data entries
 class ResearchDataManager:
@@ -39,12 +63,7 @@ class ResearchDataManager:
 
         try:
             data_points = [float(point) for point in data_points_input.split(',')]
-            self.entries.append({
-                'experiment_name': experiment_name,
-                'date': date,
-                'researcher': researcher,
-                'data_points': data_points
-            })
+            self.entries.append(ResearchEntry(experiment_name, date, researcher, data_points))
             print("Entry added successfully.")
         except ValueError:
             print("Invalid data points. Please enter numbers separated by commas.")
@@ -56,10 +75,10 @@ class ResearchDataManager:
         else:
             for i, entry in enumerate(self.entries, start=1):
                 print(f"\nEntry {i}:")
-                print(f"Experiment Name: {entry['experiment_name']}")
-                print(f"Date: {entry['date']}")
-                print(f"Researcher: {entry['researcher']}")
-                print(f"Data Points: {entry['data_points']}")
+                print(f"Experiment Name: {entry.experiment_name}")
+                print(f"Date: {entry.date}")
+                print(f"Researcher: {entry.researcher}")
+                print(f"Data Points: {list(entry.data_points)}")
 
     # Function to update a research data entry
     def update_entry(self):
@@ -76,19 +95,19 @@ class ResearchDataManager:
             data_points_input = input("Enter new data points (comma-separated) (leave blank to keep current): ").strip()
 
             if experiment_name:
-                self.entries[entry_index]['experiment_name'] = experiment_name
+                self.entries[entry_index].experiment_name = experiment_name
             if date:
                 try:
                     datetime.datetime.strptime(date, '%Y-%m-%d')
-                    self.entries[entry_index]['date'] = date
+                    self.entries[entry_index].date = date
                 except ValueError:
                     print("Invalid date format. Keeping the current date.")
             if researcher:
-                self.entries[entry_index]['researcher'] = researcher
+                self.entries[entry_index].researcher = researcher
             if data_points_input:
                 try:
                     data_points = [float(point) for point in data_points_input.split(',')]
-                    self.entries[entry_index]['data_points'] = data_points
+                    self.entries[entry_index].data_points = array('d', data_points)
                 except ValueError:
                     print("Invalid data points. Keeping the current data points.")
 
@@ -117,7 +136,7 @@ class ResearchDataManager:
             buffer = io.BytesIO()
             encoder = avro.io.BinaryEncoder(buffer)
             for entry in self.entries:
-                writer.write(entry, encoder)
+                writer.write(entry.to_dict(), encoder)
             file.write(buffer.getvalue())
         print("Entries saved to file successfully.")
 
@@ -131,7 +150,7 @@ class ResearchDataManager:
                 
                 self.entries = []
                 while buffer.tell() < len(buffer.getvalue()):
-                    entry = reader.read(decoder)
+                    entry = ResearchEntry.from_dict(reader.read(decoder))
                     self.entries.append(entry)
 
     # Function to perform data analysis
@@ -142,10 +161,10 @@ class ResearchDataManager:
 
         entry_index = int(input("Enter the entry number to analyze: ")) - 1
         if 0 <= entry_index < len(self.entries):
-            data_points = self.entries[entry_index]['data_points']
+            data_points = self.entries[entry_index].data_points
             if data_points:
                 average = sum(data_points) / len(data_points)
-                data_points.sort()
+                data_points = sorted(data_points)
                 median = data_points[len(data_points) // 2] if len(data_points) % 2 != 0 else (data_points[len(data_points) // 2 - 1] + data_points[len(data_points) // 2]) / 2
                 variance = sum((x - average) ** 2 for x in data_points) / len(data_points)
                 std_deviation = variance ** 0.5
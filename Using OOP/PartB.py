@@ -1,5 +1,21 @@
 import os
 import datetime
+import sys
+from array import array
+
+# Class for the entries kept by the manager. Its fields are fixed slots, the
+# points a compact array, and names are interned when the manager sets them.
+class ResearchEntry:
+    __slots__ = ('experiment_name', 'date', 'researcher', 'data_points')
+
+    def __init__(self, experiment_name, date, researcher, data_points):
+        self.experiment_name = experiment_name
+        self.date = date
+        self.researcher = researcher
+        self.data_points = array('d', data_points)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, sys.intern(value) if isinstance(value, str) else value)
 
 # Class to manage research data entries
 class ResearchDataManager:
@@ -35,12 +51,7 @@ class ResearchDataManager:
 
         try:
             data_points = [float(point) for point in data_points_input.split(',')]
-            self.entries.append({
-                'experiment_name': experiment_name,
-                'date': date,
-                'researcher': researcher,
-                'data_points': data_points
-            })
+            self.entries.append(ResearchEntry(experiment_name, date, researcher, data_points))
             print("Entry added successfully.")
         except ValueError:
             print("Invalid data points. Please enter numbers separated by commas.")
@@ -52,10 +63,10 @@ class ResearchDataManager:
         else:
             for i, entry in enumerate(self.entries, start=1):
                 print(f"\nEntry {i}:")
-                print(f"Experiment Name: {entry['experiment_name']}")
-                print(f"Date: {entry['date']}")
-                print(f"Researcher: {entry['researcher']}")
-                print(f"Data Points: {entry['data_points']}")
+                print(f"Experiment Name: {entry.experiment_name}")
+                print(f"Date: {entry.date}")
+                print(f"Researcher: {entry.researcher}")
+                print(f"Data Points: {list(entry.data_points)}")
 
     # Function to update a research data entry
     def update_entry(self):
@@ -69,30 +80,30 @@ class ResearchDataManager:
             if 0 <= entry_index < len(self.entries):
                 print("Leave the field blank to keep the current value.")
 
-                experiment_name = input(f"Enter the new experiment name (current: {self.entries[entry_index]['experiment_name']}): ").strip()
+                experiment_name = input(f"Enter the new experiment name (current: {self.entries[entry_index].experiment_name}): ").strip()
                 if experiment_name:
-                    self.entries[entry_index]['experiment_name'] = experiment_name
+                    self.entries[entry_index].experiment_name = experiment_name
 
-                date = input(f"Enter the new date (current: {self.entries[entry_index]['date']}): ").strip()
+                date = input(f"Enter the new date (current: {self.entries[entry_index].date}): ").strip()
                 if date:
                     while True:
                         try:
                             datetime.datetime.strptime(date, '%Y-%m-%d')
-                            self.entries[entry_index]['date'] = date
+                            self.entries[entry_index].date = date
                             break
                         except ValueError:
                             print("Invalid date format. Please enter date in YYYY-MM-DD format.")
-                            date = input(f"Enter the new date (current: {self.entries[entry_index]['date']}): ").strip()
+                            date = input(f"Enter the new date (current: {self.entries[entry_index].date}): ").strip()
 
-                researcher = input(f"Enter the new researcher's name (current: {self.entries[entry_index]['researcher']}): ").strip()
+                researcher = input(f"Enter the new researcher's name (current: {self.entries[entry_index].researcher}): ").strip()
                 if researcher:
-                    self.entries[entry_index]['researcher'] = researcher
+                    self.entries[entry_index].researcher = researcher
 
-                data_points_input = input(f"Enter new data points (current: {self.entries[entry_index]['data_points']}): ").strip()
+                data_points_input = input(f"Enter new data points (current: {list(self.entries[entry_index].data_points)}): ").strip()
                 if data_points_input:
                     try:
                         data_points = [float(point) for point in data_points_input.split(',')]
-                        self.entries[entry_index]['data_points'] = data_points
+                        self.entries[entry_index].data_points = array('d', data_points)
                     except ValueError:
                         print("Invalid data points. Please enter numbers separated by commas.")
                 print("Entry updated successfully.")
@@ -126,7 +137,7 @@ class ResearchDataManager:
     def save_entries_to_file(self):
         with open(self.filename, 'w') as file:
             for entry in self.entries:
-                data_line = f"{entry['experiment_name']},{entry['date']},{entry['researcher']}," + ",".join(map(str, entry['data_points'])) + "\n"
+                data_line = f"{entry.experiment_name},{entry.date},{entry.researcher}," + ",".join(map(str, entry.data_points)) + "\n"
                 file.write(data_line)
         print("Entries saved to file successfully.")
 
@@ -137,12 +148,7 @@ class ResearchDataManager:
                 for line in file:
                     experiment_name, date, researcher, data_points = line.strip().split('|')
                     data_points = list(map(float, data_points.split(',')))
-                    self.entries.append({
-                        'experiment_name': experiment_name,
-                        'date': date,
-                        'researcher': researcher,
-                        'data_points': data_points
-                    })
+                    self.entries.append(ResearchEntry(experiment_name, date, researcher, data_points))
 
     # Function to perform data analysis
     def analyze_data(self):
@@ -152,10 +158,10 @@ class ResearchDataManager:
 
         entry_index = int(input("Enter the entry number to analyze: ")) - 1
         if 0 <= entry_index < len(self.entries):
-            data_points = self.entries[entry_index]['data_points']
+            data_points = self.entries[entry_index].data_points
             if data_points:
                 average = sum(data_points) / len(data_points)
-                data_points.sort()
+                data_points = sorted(data_points)
                 median = data_points[len(data_points) // 2] if len(data_points) % 2 != 0 else (data_points[len(data_points) // 2 - 1] + data_points[len(data_points) // 2]) / 2
                 variance = sum((x - average) ** 2 for x in data_points) / len(data_points)
                 std_deviation = variance ** 0.5
@@ -1,5 +1,21 @@
 import os
 import datetime
+import sys
+from array import array
+
+# Record of one entry, with a fixed set of fields and no per-entry dict.
+# Its text fields are interned, so entries of one experiment share the strings.
+class ResearchEntry:
+    __slots__ = ('experiment_name', 'date', 'researcher', 'data_points')
+
+    def __init__(self, experiment_name, date, researcher, data_points):
+        self.experiment_name = experiment_name
+        self.date = date
+        self.researcher = researcher
+        self.data_points = array('d', data_points)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, sys.intern(value) if isinstance(value, str) else value)
 
 # Function to add a research data entry
 def add_entry(entries):
@@ -37,12 +53,7 @@ def add_entry(entries):
         else:
             print("Data points cannot be blank. Please try again.")
     
-    entry = {
-        "experiment_name": experiment_name,
-        "date": date,
-        "researcher": researcher,
-        "data_points": data_points
-    }
+    entry = ResearchEntry(experiment_name, date, researcher, data_points)
     entries.append(entry)
     print("Entry added successfully.")
 
@@ -53,10 +64,10 @@ def view_entries(entries):
     else:
         for i, entry in enumerate(entries, start=1):
             print(f"\nEntry {i}:")
-            print(f"Experiment Name: {entry['experiment_name']}")
-            print(f"Date: {entry['date']}")
-            print(f"Researcher: {entry['researcher']}")
-            print(f"Data Points: {entry['data_points']}")
+            print(f"Experiment Name: {entry.experiment_name}")
+            print(f"Date: {entry.date}")
+            print(f"Researcher: {entry.researcher}")
+            print(f"Data Points: {list(entry.data_points)}")
 
 # Function to update a research data entry
 def update_entry(entries):
@@ -77,7 +88,7 @@ def update_entry(entries):
     while True:
         experiment_name = input("Enter the new experiment name (leave blank to keep current): ").strip()
         if experiment_name:
-            entries[index]['experiment_name'] = experiment_name
+            entries[index].experiment_name = experiment_name
             break
         print("Experiment name cannot be blank. Please try again.")
     
@@ -86,7 +97,7 @@ def update_entry(entries):
         if date:
             try:
                 datetime.datetime.strptime(date, '%Y-%m-%d')
-                entries[index]['date'] = date
+                entries[index].date = date
                 break
             except ValueError:
                 print("Invalid date format. Please enter the date in YYYY-MM-DD format.")
@@ -96,7 +107,7 @@ def update_entry(entries):
     while True:
         researcher = input("Enter the new researcher's name (leave blank to keep current): ").strip()
         if researcher:
-            entries[index]['researcher'] = researcher
+            entries[index].researcher = researcher
             break
         print("Researcher's name cannot be blank. Please try again.")
     
@@ -105,7 +116,7 @@ def update_entry(entries):
         if data_points:
             try:
                 data_points = list(map(float, data_points.split(',')))
-                entries[index]['data_points'] = data_points
+                entries[index].data_points = array('d', data_points)
                 break
             except ValueError:
                 print("Invalid data points. Please enter numeric values separated by commas.")
@@ -137,8 +148,8 @@ def delete_entry(entries):
 def save_entries_to_file(entries, filename):
     with open(filename, 'w') as file:
         for entry in entries:
-            data_points = ','.join(map(str, entry['data_points']))
-            file.write(f"{entry['experiment_name']},{entry['date']},{entry['researcher']},{data_points}\n")
+            data_points = ','.join(map(str, entry.data_points))
+            file.write(f"{entry.experiment_name},{entry.date},{entry.researcher},{data_points}\n")
     print(f"Entries saved to {filename}.")
 
 # Function to load entries from a text file
@@ -149,12 +160,7 @@ def load_entries_from_file(filename):
             for line in file:
                 experiment_name, date, researcher, data_points = line.strip().split('|')
                 data_points = list(map(float, data_points.split(',')))
-                entry = {
-                    "experiment_name": experiment_name,
-                    "date": date,
-                    "researcher": researcher,
-                    "data_points": data_points
-                }
+                entry = ResearchEntry(experiment_name, date, researcher, data_points)
                 entries.append(entry)
     return entries
 
@@ -192,13 +198,13 @@ def analyze_data(entries):
         return
     
     for i, entry in enumerate(entries, start=1):
-        data_points = entry['data_points']
+        data_points = entry.data_points
         average = calculate_average(data_points)
         stddev = calculate_stddev(data_points)
         median = calculate_median(data_points)
         
         print(f"\nAnalysis for Entry {i}:")
-        print(f"Experiment Name: {entry['experiment_name']}")
+        print(f"Experiment Name: {entry.experiment_name}")
         print(f"Average: {average}")
         print(f"Standard Deviation: {stddev}")
         print(f"Median: {median}")